@@ -0,0 +1,101 @@
+import argparse
+import time
+import tracemalloc
+
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage, QColor, QRegion
+
+from benchmarks.sketches import application, generate
+from cad.figures import Point
+
+
+def image(sketch) -> QImage:
+    result = QImage(sketch.size(), QImage.Format_ARGB32_Premultiplied)
+    result.fill(QColor('white'))
+    return result
+
+
+def hover(sketch):
+    line = sketch.lines[len(sketch.lines) // 2]
+    x = (line.x1 + line.x2) / 2
+    y = (line.y1 + line.y2) / 2
+    sketch.currentPos = Point(x, y)
+
+
+def leave(sketch):
+    sketch.currentPos = Point(-100, -100)
+
+
+def draw(sketch, target: QImage, rect: QRect = None):
+    if rect is None:
+        sketch.render(target)
+    else:
+        sketch.render(target, rect.topLeft(), QRegion(rect))
+
+
+def timeFrames(sketch, target: QImage, frames: int, rect: QRect = None) -> float:
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw(sketch, target, rect)
+    return (time.perf_counter() - start) * 1000 / frames
+
+
+def peakFrame(sketch, target: QImage, rect: QRect = None) -> float:
+    # Peak of the Python heap traced by tracemalloc while drawing one frame.
+    # Qt's own (C++) allocations are not visible here.
+    tracemalloc.start()
+    tracemalloc.clear_traces()
+    draw(sketch, target, rect)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def measure(sketch, frames: int) -> dict:
+    target = image(sketch)
+    results = {}
+
+    for name, prepare in (('full', leave), ('hover', hover)):
+        prepare(sketch)
+        sketch.render(target)
+        results[name] = (
+            timeFrames(sketch, target, frames),
+            peakFrame(sketch, target),
+        )
+
+    rect = sketch.feedbackRect()
+    results['region'] = (
+        timeFrames(sketch, target, frames, rect),
+        peakFrame(sketch, target, rect),
+    )
+
+    return results
+
+
+def run(sizes: list, frames: int):
+    app = application()
+
+    row = '{:>8} {:>9} {:>6} {:>10} {:>14}'
+    print(row.format('lines', 'path', 'frame', 'ms/frame', 'py peak KiB'))
+
+    for size in sizes:
+        sketch = generate(size, size // 4)
+
+        for path, batching in (('entity', False), ('batched', True)):
+            sketch.batching = batching
+            results = measure(sketch, frames)
+
+            for frame, (ms, kib) in results.items():
+                print(row.format(size, path, frame, '%.3f' % ms, '%.1f' % kib))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offscreen Sketch rendering benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--frames', type=int, default=20)
+    args = parser.parse_args()
+    run(args.sizes, args.frames)
+
+
+if __name__ == '__main__':
+    main()
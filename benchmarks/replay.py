@@ -0,0 +1,61 @@
+import argparse
+import statistics
+
+from benchmarks.sketches import application
+from cad import recording
+from cad.sketch import Sketch
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values: list, q: int) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(latencies: list):
+    kinds = {}
+    for kind, latency in latencies:
+        kinds.setdefault(kind, []).append(latency * 1000)
+
+    row = '{:>8} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}'
+    print(row.format('event', 'count', 'mean', 'p50', 'p90', 'p99', 'max'))
+
+    for kind, values in sorted(kinds.items()):
+        cells = [statistics.mean(values)]
+        cells += [percentile(values, q) for q in PERCENTILES]
+        cells += [max(values)]
+        print(row.format(kind, len(values), *['%.3f' % value for value in cells]))
+
+
+def run(path: str, paint: bool, tolerance: float) -> bool:
+    app = application()
+
+    session = recording.load(path)
+    sketch = Sketch()
+    latencies = recording.replay(session, sketch, paint)
+
+    report(latencies)
+
+    actual = recording.geometry(sketch)
+    deviation = recording.difference(session['geometry'], actual)
+    print('lines {}, points {}, max deviation {}'.format(
+        len(actual['lines']), len(actual['points']), deviation))
+
+    return deviation <= tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded Sketch session headless')
+    parser.add_argument('recording')
+    parser.add_argument('--no-paint', dest='paint', action='store_false')
+    parser.add_argument('--tolerance', type=float, default=1e-6)
+    args = parser.parse_args()
+
+    if not run(args.recording, args.paint, args.tolerance):
+        raise SystemExit('final geometry differs from the recording')
+
+
+if __name__ == '__main__':
+    main()
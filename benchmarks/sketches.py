@@ -0,0 +1,35 @@
+import os
+import random
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication
+
+from cad.figures import Point, Line
+from cad.sketch import Sketch
+
+WIDTH = 1600
+HEIGHT = 1000
+
+
+def application() -> QApplication:
+    return QApplication.instance() or QApplication([])
+
+
+def randomPoint(rnd: random.Random) -> Point:
+    return Point(rnd.uniform(0, WIDTH), rnd.uniform(0, HEIGHT))
+
+
+def generate(lines: int, points: int = 0, seed: int = 0) -> Sketch:
+    rnd = random.Random(seed)
+
+    sketch = Sketch()
+    sketch.resize(WIDTH, HEIGHT)
+
+    for _ in range(lines):
+        sketch.addLine(Line(randomPoint(rnd), randomPoint(rnd)))
+
+    for _ in range(points):
+        sketch.addPoint(randomPoint(rnd))
+
+    return sketch
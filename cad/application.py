@@ -5,6 +5,7 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import *
 
 from cad.sketch import Sketch
+from cad import dxf
 from cad.solver import *
 
 directory = os.path.dirname(__file__)
@@ -20,6 +21,7 @@ class Application(QMainWindow):
         super().__init__(*args)
 
         self.sketch = None
+        self.importDialog = None
 
         self.menu = None
         self.toolBar = None
@@ -35,6 +37,7 @@ class Application(QMainWindow):
 
     def initSketch(self):
         self.sketch = Sketch(self)
+        self.sketch.handler = SelectionHandler()
         self.setCentralWidget(self.sketch)
 
     def initMenuBar(self):
@@ -44,6 +47,7 @@ class Application(QMainWindow):
         file.addAction(self.exitAction())
         file.addAction(self.openAction())
         file.addAction(self.saveAction())
+        file.addAction(self.importAction())
 
         edit = self.menu.addMenu('Edit')
         edit.addAction(self.undoAction())
@@ -63,22 +67,34 @@ class Application(QMainWindow):
         action.setShortcut('Ctrl+C')
         action.setStatusTip('Copy')
         action.setToolTip('Copy')
+        action.triggered.connect(self.copyActionHandler)
         return action
 
+    def copyActionHandler(self):
+        self.sketch.perform('copySelection')
+
     def pasteAction(self):
         action = QAction('Paste', self.menu)
         action.setShortcut('Ctrl+V')
         action.setStatusTip('Paste')
         action.setToolTip('Paste')
+        action.triggered.connect(self.pasteActionHandler)
         return action
 
+    def pasteActionHandler(self):
+        self.sketch.perform('pasteFigures')
+
     def deleteAction(self):
         action = QAction('Delete', self.menu)
         action.setShortcut('Delete')
         action.setStatusTip('Delete')
         action.setToolTip('Delete')
+        action.triggered.connect(self.deleteActionHandler)
         return action
 
+    def deleteActionHandler(self):
+        self.sketch.perform('removeSelection')
+
     def exitAction(self):
         action = QAction('Exit', self.menu)
         action.setShortcut('Ctrl+Q')
@@ -103,6 +119,14 @@ class Application(QMainWindow):
         action.triggered.connect(self.showOpenDialog)
         return action
 
+    def importAction(self):
+        action = QAction('Import DXF', self.menu)
+        action.setShortcut('Ctrl+I')
+        action.setToolTip('Import DXF drawing')
+        action.setStatusTip('Import DXF drawing')
+        action.triggered.connect(self.showImportDialog)
+        return action
+
     def initToolBar(self):
         self.toolBar = self.addToolBar('Drawing')
         self.toolBarGroup = QActionGroup(self.toolBar)
@@ -278,6 +302,8 @@ class Application(QMainWindow):
         return action
 
     def disableActionHandler(self):
+        self.sketch.handler = SelectionHandler()
+
         for action in self.toolBarGroup.actions():
             action.setChecked(False)
 
@@ -310,10 +336,45 @@ class Application(QMainWindow):
             with open(files[0], 'w') as fp:
                 fp.write('')
 
+    def showImportDialog(self):
+        ext = '*.dxf'
+        title = 'Import from'
+        default = '/home/cad.dxf'
+        files = QFileDialog().getOpenFileName(self, title, default, ext, options=0)
+
+        if not files or not files[0]:
+            return
+
+        self.importDialog = QProgressDialog('Importing...', None, 0, 100, self)
+        self.importDialog.setWindowTitle(title)
+        self.importDialog.setWindowModality(Qt.ApplicationModal)
+        self.importDialog.setMinimumDuration(0)
+        self.importDialog.show()
+
+        try:
+            dxf.load(files[0], self.sketch, tolerance=1e-6, progress=self.showImportProgress)
+        except (ValueError, OSError) as error:
+            message = 'Import failed: {}'.format(error)
+            self.statusBar().showMessage(message)
+            QMessageBox.warning(self, title, message)
+        else:
+            self.statusBar().showMessage('Ready')
+        finally:
+            self.importDialog.close()
+            self.importDialog = None
+
+    def showImportProgress(self, done: int, total: int):
+        percent = 100 * done / max(total, 1)
+        self.statusBar().showMessage('Importing... {:.0f}%'.format(percent))
+        self.importDialog.setValue(int(percent))
+        QApplication.processEvents()
+
     def keyPressEvent(self, event):
         self.sketch.keyPressEvent(event)
 
         if event.key() == Qt.Key_Escape:
+            if self.sketch.system.service:
+                self.sketch.system.service.cancel()
             return self.disableActionHandler()
 
     def closeEvent(self, event):
@@ -0,0 +1,68 @@
+import math
+
+from PyQt5.QtGui import QTransform
+
+from cad.figures import Point, Line
+from cad.solver import System, Drawing
+
+
+class Block(Drawing):
+
+    def __init__(self, lines=(), points=()):
+        super().__init__(lines, points)
+        self.system = System(self)
+        self.solved = False
+        self.picture = None
+
+    def addConstraint(self, constraint):
+        self.system.addConstraint(constraint)
+        self.invalidate()
+
+    def removeConstraint(self, constraint):
+        self.system.removeConstraint(constraint)
+        self.invalidate()
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        state['picture'] = None
+        return state
+
+    def invalidate(self):
+        self.solved = False
+        self.picture = None
+
+    def solve(self):
+        if not self.solved:
+            self.system.recount()
+            self.solved = True
+
+
+class Instance(object):
+
+    def __init__(self, block: Block, origin: Point, angle: float = 0.):
+        self.block = block
+        self.origin = origin
+        self.angle = angle
+
+    def transform(self) -> QTransform:
+        transform = QTransform()
+        transform.translate(self.origin.x, self.origin.y)
+        transform.rotate(self.angle)
+        return transform
+
+    def place(self, point: Point) -> Point:
+        angle = math.radians(self.angle)
+        cos, sin = math.cos(angle), math.sin(angle)
+        x = self.origin.x + point.x * cos - point.y * sin
+        y = self.origin.y + point.x * sin + point.y * cos
+        return Point(x, y)
+
+    @property
+    def lines(self) -> list:
+        self.block.solve()
+        return [Line(self.place(line.p1), self.place(line.p2)) for line in self.block.lines]
+
+    @property
+    def points(self) -> list:
+        self.block.solve()
+        return [self.place(point) for point in self.block.points]
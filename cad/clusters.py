@@ -0,0 +1,342 @@
+import numpy as np
+
+SHAPE_XTOL = 1e-10
+RESIDUAL = 1e-8
+ITERATIONS = 50
+STEP = 1e-7
+TURN = 1e-6
+
+
+def signature(points, constraints) -> tuple:
+    values = []
+    for constraint in constraints:
+        value = getattr(constraint, constraint.parameter) if constraint.parameter else None
+        values.append((constraint, value))
+    return frozenset(points), frozenset(values)
+
+
+def converged(equations, x: np.ndarray, ier: int) -> bool:
+    return ier == 1 or np.abs(equations(x)).max() <= RESIDUAL
+
+
+def newton(equations, z: np.ndarray):
+    f = equations(z)
+    for _ in range(ITERATIONS):
+        if not np.all(np.isfinite(f)):
+            return None
+        if np.abs(f).max() <= RESIDUAL * (1 + np.abs(z).max()):
+            return z
+
+        matrix = np.zeros((len(f), len(z)))
+        for j in range(len(z)):
+            h = STEP * max(1., abs(z[j]))
+            shifted = z.copy()
+            shifted[j] += h
+            matrix[:, j] = (equations(shifted) - f) / h
+
+        step = np.linalg.lstsq(matrix, -f, rcond=None)[0]
+        z = z + step
+        f = equations(z)
+
+    return None
+
+
+class Body(object):
+
+    def __init__(self, points: tuple, shape: np.ndarray, rotates: bool):
+        self.points = points
+        self.shape = shape
+        self.rotates = rotates
+
+    @property
+    def size(self) -> int:
+        return 3 if self.rotates else 2
+
+    def matches(self, coordinates: np.ndarray) -> bool:
+        d = coordinates - coordinates.mean(axis=0)
+        scale = np.linalg.norm(self.shape) * np.linalg.norm(d)
+        if np.linalg.det(self.shape.T @ d) < -TURN * scale ** 2:
+            return False
+        return self.rotates or np.sum(self.shape * d) >= -TURN * scale
+
+    def fit(self, coordinates: np.ndarray) -> np.ndarray:
+        center = coordinates.mean(axis=0)
+        if not self.rotates:
+            return center
+
+        d = coordinates - center
+        s = self.shape
+        sin = np.sum(s[:, 0] * d[:, 1] - s[:, 1] * d[:, 0])
+        cos = np.sum(s[:, 0] * d[:, 0] + s[:, 1] * d[:, 1])
+        return np.array([center[0], center[1], np.arctan2(sin, cos)])
+
+    def place(self, q: np.ndarray) -> np.ndarray:
+        if not self.rotates:
+            return self.shape + q[:2]
+
+        cos, sin = np.cos(q[2]), np.sin(q[2])
+        x = self.shape[:, 0] * cos - self.shape[:, 1] * sin
+        y = self.shape[:, 0] * sin + self.shape[:, 1] * cos
+        return np.stack([x, y], axis=1) + q[:2]
+
+    def reduce(self, q: np.ndarray, coordinates: np.ndarray, gradient: np.ndarray) -> list:
+        result = list(gradient.sum(axis=0))
+        if self.rotates:
+            d = coordinates - q[:2]
+            result.append(np.sum(d[:, 0] * gradient[:, 1] - d[:, 1] * gradient[:, 0]))
+        return result
+
+
+def jacobian(system, coordinates: np.ndarray) -> np.ndarray:
+    size = len(coordinates)
+    constraints = list(system.constraints)
+    result = np.zeros((len(constraints), size))
+
+    for i, constraint in enumerate(constraints):
+        x = np.zeros(size + len(constraints))
+        y = np.zeros(size + len(constraints))
+        x[:size] = coordinates
+        x[size + i] = 1.
+        constraint.apply(system, x, y, size + i)
+        result[i] = y[:size]
+
+    return result
+
+
+def analyse(points: tuple, constraints: list, interrupt=None):
+    from cad.solver import System, Drawing
+
+    system = System(Drawing(points=points))
+    system.interrupt = interrupt
+    for constraint in constraints:
+        system.addConstraint(constraint)
+
+    system.compile()
+    size = len(system.anchors)
+
+    x0 = system.x0
+    x0[:size] = system.anchors
+    x, _, ier, _ = system.solve(x0, SHAPE_XTOL)
+    if not converged(system.system, x, ier):
+        return None
+
+    coordinates = x[:size]
+    matrix = jacobian(system, coordinates)
+    freedom = size - np.linalg.matrix_rank(matrix)
+
+    shape = coordinates.reshape(-1, 2)
+    shape = shape - shape.mean(axis=0)
+
+    if freedom == 2:
+        return Body(points, shape, False)
+
+    if freedom == 3:
+        rotation = np.stack([-shape[:, 1], shape[:, 0]], axis=1).ravel()
+        scale = np.linalg.norm(matrix) * np.linalg.norm(rotation) + 1.
+        if np.linalg.norm(matrix @ rotation) <= 1e-6 * scale:
+            return Body(points, shape, True)
+
+    return None
+
+
+class Reduction(object):
+
+    def __init__(self, system):
+        self.system = system
+        self.clusters = []
+        self.decomposed = False
+        self.cache = {}
+
+    def invalidate(self, constraint=None):
+        if constraint is None:
+            self.clusters = []
+        elif constraint.absolute:
+            return
+        else:
+            points = set(constraint.points)
+            self.clusters = [(group, c) for group, c in self.clusters if group.isdisjoint(points)]
+        self.decomposed = False
+
+    def live(self, key: tuple) -> bool:
+        constraints = self.system.constraints
+        for constraint, value in key[1]:
+            if constraint not in constraints:
+                return False
+            if constraint.parameter and getattr(constraint, constraint.parameter) != value:
+                return False
+        return True
+
+    def internal(self, group: frozenset, byPoint: dict) -> list:
+        constraints = {}
+        for point in group:
+            for constraint in byPoint[point]:
+                if all(p in group for p in constraint.points):
+                    constraints[constraint] = None
+        return list(constraints)
+
+    def body(self, group: frozenset, constraints: list):
+        key = signature(group, constraints)
+        cached = self.cache.get(key, [])
+        if cached is None:
+            return None
+
+        points = tuple(sorted(group, key=self.system.index))
+        coordinates = np.array([point.coordinates for point in points], dtype=float)
+        for body in cached:
+            if body.matches(coordinates):
+                return body
+
+        body = analyse(points, constraints, self.system.interrupt)
+        if body is None:
+            if cached:
+                return cached[0]
+            self.cache[key] = None
+            return None
+
+        self.cache[key] = [body] + cached[:1]
+        return body
+
+    def decompose(self, clusters=()) -> list:
+        shaping = [c for c in self.system.constraints if not c.absolute]
+
+        byPoint = {}
+        for constraint in shaping:
+            for point in constraint.points:
+                byPoint.setdefault(point, []).append(constraint)
+
+        cluster = {point: frozenset([point]) for point in byPoint}
+        rigid = set()
+        for group, _ in clusters:
+            rigid.add(group)
+            for point in group:
+                cluster[point] = group
+
+        def neighbours(groups: set) -> set:
+            result = set(groups)
+            for group in groups:
+                for point in group:
+                    for constraint in byPoint[point]:
+                        result.update(cluster[p] for p in constraint.points)
+            return result
+
+        changed = True
+        while changed:
+            changed = False
+            for constraint in shaping:
+                if self.system.interrupt:
+                    self.system.interrupt()
+
+                groups = {cluster[point] for point in constraint.points}
+                if len(groups) == 1 and next(iter(groups)) in rigid:
+                    continue
+
+                for candidates in (groups, neighbours(groups)):
+                    group = frozenset().union(*candidates)
+                    if len(group) < 2:
+                        continue
+                    if not self.body(group, self.internal(group, byPoint)):
+                        continue
+
+                    rigid.difference_update(candidates)
+                    rigid.add(group)
+                    for point in group:
+                        cluster[point] = group
+                    changed = True
+                    break
+
+        return [(group, self.internal(group, byPoint)) for group in rigid]
+
+    def bodies(self) -> list:
+        if not self.decomposed:
+            self.clusters = self.decompose(self.clusters)
+            self.cache = {key: body for key, body in self.cache.items() if self.live(key)}
+            self.decomposed = True
+
+        bodies = []
+        for group, constraints in self.clusters:
+            body = self.body(group, constraints)
+            if body:
+                bodies.append((body, constraints))
+        return bodies
+
+    def solve(self):
+        from cad.solver import System, Drawing
+
+        self.system.compile()
+        bodies = self.bodies()
+
+        internal = set()
+        for _, constraints in bodies:
+            internal.update(constraints)
+        external = [c for c in self.system.constraints if c not in internal]
+
+        inBody = set()
+        for body, _ in bodies:
+            inBody.update(body.points)
+
+        free = {}
+        for constraint in external:
+            for point in constraint.points:
+                if point not in inBody:
+                    free[point] = None
+        free = list(free)
+
+        points = free + [point for body, _ in bodies for point in body.points]
+        local = System(Drawing(points=points))
+        for constraint in external:
+            local.addConstraint(constraint)
+        local.compile()
+
+        anchors = local.anchors.reshape(-1, 2)
+        size = len(local.anchors)
+        freeSize = len(free) * 2
+
+        spans = []
+        offset = len(free)
+        for body, _ in bodies:
+            span = slice(offset, offset + len(body.points))
+            spans.append((body, span, body.fit(anchors[span])))
+            offset += len(body.points)
+
+        def expand(z: np.ndarray) -> tuple:
+            coordinates = anchors.copy()
+            coordinates[:len(free)] = z[:freeSize].reshape(-1, 2)
+            params = []
+            n = freeSize
+            for body, span, base in spans:
+                q = base + z[n:n + body.size]
+                coordinates[span] = body.place(q)
+                params.append(q)
+                n += body.size
+            return coordinates, params, z[n:]
+
+        def equations(z: np.ndarray) -> np.ndarray:
+            if self.system.interrupt:
+                self.system.interrupt()
+
+            coordinates, params, multipliers = expand(z)
+
+            x = np.concatenate([coordinates.ravel(), multipliers])
+            y = np.zeros(shape=x.shape, dtype=x.dtype)
+            y[:size] = 2 * (x[:size] - local.anchors)
+            for i, constraint in enumerate(local.constraints):
+                constraint.apply(local, x, y, size + i)
+
+            gradient = y[:size].reshape(-1, 2)
+            result = list(gradient[:len(free)].ravel())
+            for (body, span, _), q in zip(spans, params):
+                result.extend(body.reduce(q, coordinates[span], gradient[span]))
+            result.extend(y[size:])
+            return np.array(result)
+
+        z0 = [anchors[:len(free)].ravel()]
+        z0 += [np.zeros(body.size) for body, _, _ in spans]
+        z0 += [np.zeros(len(external))]
+        z0 = np.concatenate(z0)
+
+        z = newton(equations, z0)
+        if z is None:
+            return None
+
+        coordinates, _, _ = expand(z)
+        return points, coordinates
@@ -0,0 +1,113 @@
+import math
+import os
+
+from cad.figures import Point, Line
+
+CHUNK = 10000
+
+
+class Welder(object):
+
+    def __init__(self, tolerance: float):
+        self.tolerance = tolerance
+        self.cells = {}
+
+    def cell(self, x: float, y: float) -> tuple:
+        return math.floor(x / self.tolerance), math.floor(y / self.tolerance)
+
+    def point(self, x: float, y: float) -> Point:
+        i, j = self.cell(x, y)
+
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                for point in self.cells.get((i + di, j + dj), ()):
+                    if math.hypot(point.x - x, point.y - y) <= self.tolerance:
+                        return point
+
+        point = Point(x, y)
+        self.cells.setdefault((i, j), []).append(point)
+        return point
+
+
+class Reader(object):
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.position = 0
+
+    def __iter__(self):
+        for code in self.stream:
+            value = next(self.stream, b'')
+            self.position += len(code) + len(value)
+            yield int(code), value.strip().decode('latin-1')
+
+
+def entities(reader: Reader):
+    section = None
+    entity = None
+    expectName = False
+
+    for code, value in reader:
+        if code == 0:
+            if entity is not None:
+                yield entity
+                entity = None
+
+            if value == 'SECTION':
+                expectName = True
+            elif value == 'ENDSEC':
+                section = None
+            elif section == 'ENTITIES' and value in ('LINE', 'POINT'):
+                entity = {0: value}
+
+        elif code == 2 and expectName:
+            section = value
+            expectName = False
+
+        elif entity is not None and code in (10, 20, 11, 21):
+            entity[code] = float(value)
+
+    if entity is not None:
+        yield entity
+
+
+def load(path: str, sketch, tolerance: float = None, chunk: int = CHUNK, progress=None) -> tuple:
+    total = os.path.getsize(path)
+    welder = Welder(tolerance) if tolerance else None
+
+    def point(x: float, y: float) -> Point:
+        if welder:
+            return welder.point(x, y)
+        return Point(x, y)
+
+    lines = []
+    points = []
+    counts = [0, 0]
+
+    def flush(reader: Reader):
+        sketch.addLines(lines)
+        sketch.addPoints(points)
+        counts[0] += len(lines)
+        counts[1] += len(points)
+        lines.clear()
+        points.clear()
+        if progress:
+            progress(reader.position, total)
+
+    with open(path, 'rb') as stream, sketch.transaction():
+        reader = Reader(stream)
+
+        for entity in entities(reader):
+            if entity[0] == 'LINE':
+                p1 = point(entity.get(10, 0.), entity.get(20, 0.))
+                p2 = point(entity.get(11, 0.), entity.get(21, 0.))
+                lines.append(Line(p1, p2))
+            else:
+                points.append(Point(entity.get(10, 0.), entity.get(20, 0.)))
+
+            if len(lines) + len(points) >= chunk:
+                flush(reader)
+
+        flush(reader)
+
+    return tuple(counts)
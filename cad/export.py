@@ -0,0 +1,126 @@
+import argparse
+import multiprocessing
+import os
+
+from PyQt5.QtCore import QSize, QRect
+from PyQt5.QtGui import QImage, QPainter, QColor
+from PyQt5.QtSvg import QSvgGenerator
+from PyQt5.QtWidgets import QApplication
+
+from cad.figures import Point, Line
+from cad.sketch import Sketch
+from cad import dxf
+
+MARGIN = 10
+
+LOADERS = {
+    '.dxf': dxf.load,
+}
+
+application = None
+
+
+def initWorker():
+    global application
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    application = QApplication.instance() or QApplication([])
+
+
+def bounds(sketch) -> tuple:
+    xs = [point.x for point in sketch.system.points]
+    ys = [point.y for point in sketch.system.points]
+    if not xs:
+        return 0., 0., 1., 1.
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def fit(sketch, size: QSize) -> Sketch:
+    left, top, right, bottom = bounds(sketch)
+    width = max(right - left, 1e-9)
+    height = max(bottom - top, 1e-9)
+    scale = min((size.width() - 2 * MARGIN) / width, (size.height() - 2 * MARGIN) / height)
+
+    mapped = {}
+
+    def place(point: Point) -> Point:
+        if point not in mapped:
+            x = MARGIN + (point.x - left) * scale
+            y = MARGIN + (point.y - top) * scale
+            mapped[point] = Point(x, y)
+        return mapped[point]
+
+    result = Sketch()
+    result.resize(size)
+    result.addLines([Line(place(line.p1), place(line.p2)) for line in sketch.lines])
+    result.addPoints([place(point) for point in sketch.points])
+    return result
+
+
+def paint(sketch, device):
+    painter = QPainter()
+    painter.begin(device)
+    painter.setRenderHint(QPainter.Antialiasing)
+    sketch.drawLines(painter)
+    sketch.drawPoints(painter)
+    painter.end()
+
+
+def savePng(sketch, path: str):
+    image = QImage(sketch.size(), QImage.Format_ARGB32_Premultiplied)
+    image.fill(QColor('white'))
+    paint(sketch, image)
+    image.save(path, 'PNG')
+
+
+def saveSvg(sketch, path: str):
+    generator = QSvgGenerator()
+    generator.setFileName(path)
+    generator.setSize(sketch.size())
+    generator.setViewBox(QRect(0, 0, sketch.width(), sketch.height()))
+    paint(sketch, generator)
+
+
+SAVERS = {
+    'png': savePng,
+    'svg': saveSvg,
+}
+
+
+def exportOne(task: tuple) -> str:
+    source, directory, fmt, size = task
+
+    name = os.path.splitext(os.path.basename(source))[0]
+    target = os.path.join(directory, '{}.{}'.format(name, fmt))
+
+    sketch = Sketch()
+    LOADERS[os.path.splitext(source)[1].lower()](source, sketch)
+    SAVERS[fmt](fit(sketch, QSize(size, size)), target)
+
+    return target
+
+
+def export(sources: list, directory: str, fmt: str = 'png', size: int = 256, processes: int = None):
+    os.makedirs(directory, exist_ok=True)
+    tasks = [(source, directory, fmt, size) for source in sources]
+
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes, initializer=initWorker) as pool:
+        for target in pool.imap_unordered(exportOne, tasks, chunksize=8):
+            yield target
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export sketches to PNG or SVG previews')
+    parser.add_argument('sources', nargs='+')
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--format', choices=sorted(SAVERS), default='png')
+    parser.add_argument('--size', type=int, default=256)
+    parser.add_argument('--processes', type=int)
+    args = parser.parse_args()
+
+    for target in export(args.sources, args.output, args.format, args.size, args.processes):
+        print(target)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+import itertools
+import json
+import os
+import queue
+import threading
+
+from cad.figures import Point, Line
+from cad import solver
+
+INTERVAL = 1.
+COMPACTION = 10000
+
+ARGUMENTS = {
+    'Length': ('length', ),
+    'Angle': ('angle', ),
+    'FixingX': ('value', ),
+    'FixingY': ('value', ),
+}
+
+
+class Model(object):
+
+    def __init__(self):
+        self.seq = 0
+        self.points = {}
+        self.lines = {}
+        self.free = {}
+        self.constraints = {}
+        self.uses = {}
+
+    def link(self, ids, step: int):
+        for eid in ids:
+            count = self.uses.get(eid, 0) + step
+            if count > 0:
+                self.uses[eid] = count
+            else:
+                self.uses.pop(eid, None)
+                self.points.pop(eid, None)
+
+    def apply(self, op: list):
+        kind = op[0]
+
+        if kind == 'line':
+            _, lid, p1, p2 = op
+            for pid, x, y in (p1, p2):
+                self.points[pid] = [x, y]
+            previous = self.lines.get(lid, ())
+            self.lines[lid] = [p1[0], p2[0]]
+            self.link(self.lines[lid], 1)
+            self.link(previous, -1)
+        elif kind == 'point':
+            _, pid, x, y = op
+            self.points[pid] = [x, y]
+            if pid not in self.free:
+                self.free[pid] = None
+                self.link([pid], 1)
+        elif kind == 'move':
+            _, pid, x, y = op
+            if pid in self.points:
+                self.points[pid] = [x, y]
+        elif kind == 'constraint':
+            _, cid, name, refs, args = op
+            previous = self.constraints.get(cid, [None, ()])[1]
+            self.constraints[cid] = [name, refs, args]
+            self.link(refs, 1)
+            self.link(previous, -1)
+        elif kind == 'remove':
+            _, eid = op
+            if eid in self.lines:
+                self.link(self.lines.pop(eid), -1)
+            elif eid in self.free:
+                del self.free[eid]
+                self.link([eid], -1)
+            elif eid in self.constraints:
+                self.link(self.constraints.pop(eid)[1], -1)
+
+    def ops(self) -> list:
+        result = []
+        for lid, (p1, p2) in self.lines.items():
+            result.append(['line', lid, [p1] + self.points[p1], [p2] + self.points[p2]])
+        for pid in self.free:
+            result.append(['point', pid] + self.points[pid])
+        for cid, (name, refs, args) in self.constraints.items():
+            result.append(['constraint', cid, name, refs, args])
+        return result
+
+    def build(self, sketch):
+        points = {pid: Point(x, y) for pid, (x, y) in self.points.items()}
+        lines = {lid: Line(points[p1], points[p2]) for lid, (p1, p2) in self.lines.items()}
+        entities = dict(points)
+        entities.update(lines)
+
+        sketch.addLines(list(lines.values()))
+        sketch.addPoints([points[pid] for pid in self.free])
+
+        objects = dict(entities)
+        for cid, (name, refs, args) in self.constraints.items():
+            if any(ref not in entities for ref in refs):
+                continue
+            constraint = getattr(solver, name)(*[entities[ref] for ref in refs], *args)
+            sketch.system.addConstraint(constraint)
+            objects[cid] = constraint
+
+        return objects
+
+
+def read(path: str):
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as fp:
+        for line in fp:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+
+def load(path: str) -> Model:
+    model = Model()
+
+    for seq, op in read(path + '.snapshot'):
+        model.seq = max(model.seq, seq)
+        model.apply(op)
+
+    for seq, op in read(path + '.journal'):
+        if seq > model.seq:
+            model.seq = seq
+            model.apply(op)
+
+    return model
+
+
+class Writer(threading.Thread):
+
+    def __init__(self, path: str, model: Model):
+        super().__init__(daemon=True)
+        self.path = path
+        self.model = model
+        self.queue = queue.Queue()
+        self.written = 0
+        self.stream = open(path + '.journal', 'a')
+
+    def run(self):
+        running = True
+        while running:
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=INTERVAL))
+                while True:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if None in batch:
+                running = False
+                batch = batch[:batch.index(None)]
+
+            self.write(batch)
+
+            if self.written >= COMPACTION:
+                self.compact()
+
+        self.stream.close()
+
+    def write(self, batch: list):
+        if not batch:
+            return
+
+        for seq, op in batch:
+            self.stream.write(json.dumps([seq, op]) + '\n')
+            self.model.seq = seq
+            self.model.apply(op)
+
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+        self.written += len(batch)
+
+    def compact(self):
+        target = self.path + '.snapshot'
+        temporary = target + '.tmp'
+
+        with open(temporary, 'w') as fp:
+            for op in self.model.ops():
+                fp.write(json.dumps([self.model.seq, op]) + '\n')
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temporary, target)
+
+        self.stream.close()
+        self.stream = open(self.path + '.journal', 'w')
+        self.written = 0
+
+
+class Journal(object):
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ids = {}
+        self.counter = itertools.count(1)
+        self.seq = itertools.count(1)
+        self.writer = None
+        self.system = None
+        self.deferred = None
+        self.marks = []
+
+    def attach(self, sketch):
+        model = load(self.path)
+        if model.lines or model.free or model.constraints:
+            objects = model.build(sketch)
+            self.ids = {obj: eid for eid, obj in objects.items()}
+            self.counter = itertools.count(max(objects) + 1)
+            self.seq = itertools.count(model.seq + 1)
+            sketch.update()
+
+        self.writer = Writer(self.path, model)
+        self.writer.start()
+
+        sketch.journal = self
+        sketch.system.journal = self
+        self.system = sketch.system
+
+        for line in sketch.lines:
+            if line not in self.ids:
+                self.addLine(line)
+        for point in sketch.points:
+            if point not in self.ids:
+                self.addPoint(point)
+        for constraint in sketch.system.constraints:
+            if constraint not in self.ids:
+                self.addConstraint(constraint)
+
+    def close(self):
+        if self.writer:
+            self.writer.queue.put(None)
+            self.writer.join()
+            self.writer = None
+
+    def id(self, entity) -> int:
+        if entity not in self.ids:
+            self.ids[entity] = next(self.counter)
+        return self.ids[entity]
+
+    def emit(self, *op):
+        if self.deferred is not None:
+            self.deferred.append(op)
+        elif self.writer:
+            self.writer.queue.put((next(self.seq), list(op)))
+
+    def begin(self):
+        if self.deferred is None:
+            self.deferred = []
+        self.marks.append((len(self.deferred), dict(self.ids)))
+
+    def commit(self):
+        self.marks.pop()
+        if not self.marks:
+            self.flush()
+
+    def rollback(self):
+        size, self.ids = self.marks.pop()
+        del self.deferred[size:]
+        if not self.marks:
+            self.flush()
+
+    def flush(self):
+        ops, self.deferred = self.deferred, None
+        for op in ops:
+            self.emit(*op)
+
+    def endpoint(self, point: Point) -> list:
+        return [self.id(point), point.x, point.y]
+
+    def addLine(self, line: Line):
+        self.emit('line', self.id(line), self.endpoint(line.p1), self.endpoint(line.p2))
+
+    def addPoint(self, point: Point):
+        self.emit('point', self.id(point), point.x, point.y)
+
+    def addConstraint(self, constraint):
+        if any(entity not in self.ids for entity in constraint.entities):
+            return
+        name = type(constraint).__name__
+        refs = [self.id(entity) for entity in constraint.entities]
+        args = [getattr(constraint, arg) for arg in ARGUMENTS.get(name, ())]
+        self.emit('constraint', self.id(constraint), name, refs, args)
+
+    def setLineEnd(self, line: Line, previous: Point):
+        if line in self.ids and previous in self.ids and line.p2 not in self.ids and self.orphaned(previous):
+            self.ids[line.p2] = self.ids.pop(previous)
+            self.move([line.p2])
+        else:
+            self.addLine(line)
+            self.release(previous)
+
+    def remove(self, entity):
+        if entity not in self.ids:
+            return
+
+        self.emit('remove', self.ids[entity])
+        if isinstance(entity, Point):
+            self.release(entity)
+            return
+
+        del self.ids[entity]
+        if isinstance(entity, Line):
+            for point in entity.points:
+                self.release(point)
+
+    def orphaned(self, point: Point) -> bool:
+        return not self.system.isUsed(point) and point not in self.system.references
+
+    def release(self, point: Point):
+        if self.orphaned(point):
+            self.ids.pop(point, None)
+
+    def move(self, points):
+        for point in points:
+            if point in self.ids:
+                self.emit('move', self.ids[point], point.x, point.y)
@@ -9,8 +9,20 @@ ACTIVE_WIDTH = 7
 ACTIVE_COLOR = Qt.darkGray
 ACTIVE_STYLE = STYLE
 
+SELECTED_COLOR = Qt.darkBlue
+BAND_STYLE = Qt.DashLine
+
+OVERLAY_COLOR = Qt.black
+
 line = QPen(COLOR, WIDTH, STYLE)
 point = QPen(line.color(), WIDTH * 2, line.style())
 
 activeLine = QPen(ACTIVE_COLOR, ACTIVE_WIDTH, ACTIVE_STYLE)
 activePoint = QPen(ACTIVE_COLOR, ACTIVE_WIDTH * 2, ACTIVE_STYLE)
+
+selectedLine = QPen(SELECTED_COLOR, WIDTH, STYLE)
+selectedPoint = QPen(SELECTED_COLOR, WIDTH * 2, STYLE)
+
+band = QPen(SELECTED_COLOR, 1, BAND_STYLE)
+
+overlay = QPen(OVERLAY_COLOR)
@@ -0,0 +1,135 @@
+import json
+import time
+
+from PyQt5.QtCore import QEvent, QPointF, Qt
+from PyQt5.QtGui import QImage, QMouseEvent, QKeyEvent, QColor
+
+from cad import solver
+
+MOUSE_EVENTS = {
+    'press': QEvent.MouseButtonPress,
+    'move': QEvent.MouseMove,
+    'release': QEvent.MouseButtonRelease,
+}
+
+
+def geometry(sketch) -> dict:
+    return {
+        'lines': [[line.x1, line.y1, line.x2, line.y2] for line in sketch.lines],
+        'points': [list(point.coordinates) for point in sketch.points],
+    }
+
+
+def handlerArguments(handler) -> dict:
+    arguments = {}
+    for name, value in vars(handler).items():
+        if isinstance(value, (int, float)):
+            arguments[name] = value
+    return arguments
+
+
+class Recorder(object):
+
+    def __init__(self):
+        self.events = []
+        self.handler = None
+        self.started = time.perf_counter()
+
+    def attach(self, sketch):
+        sketch.recorder = self
+
+    def record(self, sketch, kind: str, event):
+        now = time.perf_counter() - self.started
+
+        if sketch.handler is not self.handler:
+            self.handler = sketch.handler
+            self.events.append({
+                'type': 'handler',
+                'time': now,
+                'name': type(self.handler).__name__,
+                'args': handlerArguments(self.handler),
+            })
+
+        entry = {'type': kind, 'time': now}
+        if kind == 'key':
+            entry['key'] = event.key()
+        elif kind == 'action':
+            entry['name'] = event
+        else:
+            position = event.localPos()
+            entry['x'] = position.x()
+            entry['y'] = position.y()
+            entry['button'] = int(event.button())
+            entry['buttons'] = int(event.buttons())
+        self.events.append(entry)
+
+    def save(self, path: str, sketch):
+        recording = {
+            'size': [sketch.width(), sketch.height()],
+            'events': self.events,
+            'geometry': geometry(sketch),
+        }
+        with open(path, 'w') as fp:
+            json.dump(recording, fp)
+
+
+def load(path: str) -> dict:
+    with open(path, 'r') as fp:
+        return json.load(fp)
+
+
+def toQtEvent(entry: dict):
+    if entry['type'] == 'key':
+        return QKeyEvent(QEvent.KeyPress, entry['key'], Qt.NoModifier)
+
+    position = QPointF(entry['x'], entry['y'])
+    button = Qt.MouseButton(entry['button'])
+    buttons = Qt.MouseButtons(entry['buttons'])
+    return QMouseEvent(MOUSE_EVENTS[entry['type']], position, button, buttons, Qt.NoModifier)
+
+
+def dispatch(sketch, entry: dict):
+    kind = entry['type']
+
+    if kind == 'handler':
+        sketch.handler = getattr(solver, entry['name'])(**entry['args'])
+    elif kind == 'press':
+        sketch.mousePressEvent(toQtEvent(entry))
+    elif kind == 'move':
+        sketch.mouseMoveEvent(toQtEvent(entry))
+    elif kind == 'release':
+        sketch.mouseReleaseEvent(toQtEvent(entry))
+    elif kind == 'key':
+        sketch.keyPressEvent(toQtEvent(entry))
+    elif kind == 'action':
+        getattr(sketch, entry['name'])()
+
+
+def replay(recording: dict, sketch, paint: bool = True) -> list:
+    sketch.resize(*recording['size'])
+
+    target = QImage(sketch.size(), QImage.Format_ARGB32_Premultiplied)
+    target.fill(QColor('white'))
+
+    latencies = []
+    for entry in recording['events']:
+        start = time.perf_counter()
+        dispatch(sketch, entry)
+        if paint and entry['type'] != 'handler':
+            sketch.render(target)
+        latencies.append((entry['type'], time.perf_counter() - start))
+
+    return latencies
+
+
+def difference(expected: dict, actual: dict) -> float:
+    if len(expected['lines']) != len(actual['lines']):
+        return float('inf')
+    if len(expected['points']) != len(actual['points']):
+        return float('inf')
+
+    result = 0.
+    for kind in ('lines', 'points'):
+        for a, b in zip(expected[kind], actual[kind]):
+            result = max([result] + [abs(u - v) for u, v in zip(a, b)])
+    return result
@@ -0,0 +1,175 @@
+import copy
+import math
+
+from PyQt5.QtCore import QRectF
+
+from cad.blocks import Instance
+from cad.figures import Point, Line
+
+CELL = 64.
+LARGE = 1024
+
+
+def extent(figure) -> tuple:
+    if isinstance(figure, Line):
+        (x1, y1), (x2, y2) = figure.p1.coordinates, figure.p2.coordinates
+        return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+    return figure.x, figure.y, figure.x, figure.y
+
+
+def crosses(line: Line, left: float, top: float, right: float, bottom: float) -> bool:
+    (x1, y1), (x2, y2) = line.p1.coordinates, line.p2.coordinates
+    dx, dy = x2 - x1, y2 - y1
+    sides = [dx * (y - y1) - dy * (x - x1) for x in (left, right) for y in (top, bottom)]
+    return min(sides) <= 0 <= max(sides)
+
+
+class Grid(object):
+
+    def __init__(self, cell: float = CELL):
+        self.cell = cell
+        self.cells = {}
+        self.large = {}
+        self.keys = {}
+        self.order = {}
+        self.ends = {}
+        self.attached = {}
+
+    def span(self, left: float, top: float, right: float, bottom: float) -> tuple:
+        keys = (math.floor(value / self.cell) for value in (left, top, right, bottom))
+        return tuple(keys)
+
+    def traverse(self, line: Line) -> list:
+        (x1, y1), (x2, y2) = sorted((line.p1.coordinates, line.p2.coordinates))
+        slope = (y2 - y1) / (x2 - x1) if x2 != x1 else 0.
+
+        keys = []
+        for x in range(math.floor(x1 / self.cell), math.floor(x2 / self.cell) + 1):
+            left = max(x1, x * self.cell)
+            right = min(x2, (x + 1) * self.cell)
+            ys = (y1, y2) if x2 == x1 else (y1 + (left - x1) * slope, y1 + (right - x1) * slope)
+            top, bottom = math.floor(min(ys) / self.cell), math.floor(max(ys) / self.cell)
+            keys.extend((x, y) for y in range(top, bottom + 1))
+        return keys
+
+    def insert(self, figure):
+        self.order.setdefault(figure, len(self.order))
+
+        if isinstance(figure, Line):
+            keys = self.traverse(figure)
+            self.ends[figure] = figure.points
+            for point in figure.points:
+                self.attached.setdefault(point, {})[figure] = None
+        else:
+            keys = [self.span(*extent(figure))[:2]]
+
+        if len(keys) > LARGE:
+            self.large[figure] = None
+            self.keys[figure] = ()
+            return
+
+        for key in keys:
+            self.cells.setdefault(key, {})[figure] = None
+        self.keys[figure] = keys
+
+    def remove(self, figure):
+        self.large.pop(figure, None)
+        for point in self.ends.pop(figure, ()):
+            lines = self.attached.get(point)
+            if lines is None:
+                continue
+            lines.pop(figure, None)
+            if not lines:
+                del self.attached[point]
+        for key in self.keys.pop(figure, ()):
+            cell = self.cells[key]
+            del cell[figure]
+            if not cell:
+                del self.cells[key]
+
+    def touching(self, points) -> list:
+        result = {}
+        for point in points:
+            result.update(self.attached.get(point, ()))
+            if point in self.keys:
+                result[point] = None
+        return list(result)
+
+    def build(self, lines, points):
+        for line in lines:
+            self.insert(line)
+        for point in points:
+            self.insert(point)
+        return self
+
+    def candidates(self, rect: QRectF) -> list:
+        x1, y1, x2, y2 = self.span(rect.left(), rect.top(), rect.right(), rect.bottom())
+        found = dict(self.large)
+
+        if (x2 - x1 + 1) * (y2 - y1 + 1) > len(self.cells):
+            for (x, y), figures in self.cells.items():
+                if x1 <= x <= x2 and y1 <= y <= y2:
+                    found.update(figures)
+        else:
+            for x in range(x1, x2 + 1):
+                for y in range(y1, y2 + 1):
+                    found.update(self.cells.get((x, y), ()))
+
+        return sorted(found, key=self.order.__getitem__)
+
+    def query(self, rect: QRectF) -> list:
+        rect = rect.normalized()
+        left, top, right, bottom = rect.left(), rect.top(), rect.right(), rect.bottom()
+
+        result = []
+        for figure in self.candidates(rect):
+            x1, y1, x2, y2 = extent(figure)
+            if left <= x1 and x2 <= right and top <= y1 and y2 <= bottom:
+                result.append(figure)
+        return result
+
+    def intersecting(self, rect: QRectF) -> list:
+        rect = rect.normalized()
+        left, top, right, bottom = rect.left(), rect.top(), rect.right(), rect.bottom()
+
+        result = []
+        for figure in self.candidates(rect):
+            x1, y1, x2, y2 = extent(figure)
+            if x1 <= right and left <= x2 and y1 <= bottom and top <= y2:
+                if not isinstance(figure, Line) or crosses(figure, left, top, right, bottom):
+                    result.append(figure)
+        return result
+
+
+def points(figures) -> list:
+    result = {}
+    for figure in figures:
+        if isinstance(figure, Line):
+            result.update(dict.fromkeys(figure.points))
+        elif isinstance(figure, Instance):
+            result[figure.origin] = None
+        else:
+            result[figure] = None
+    return list(result)
+
+
+def translate(figures, dx: float, dy: float) -> list:
+    result = points(figures)
+    for point in result:
+        point.x += dx
+        point.y += dy
+    return result
+
+
+def internal(figures, constraints) -> list:
+    inside = set(points(figures))
+    inside.update(figures)
+    return [c for c in constraints if not c.absolute and all(e in inside for e in c.entities)]
+
+
+def duplicate(figures, constraints) -> tuple:
+    lines = [figure for figure in figures if isinstance(figure, Line)]
+    free = [figure for figure in figures if isinstance(figure, Point)]
+    instances = [figure for figure in figures if isinstance(figure, Instance)]
+    blocks = {id(instance.block): instance.block for instance in instances}
+    return copy.deepcopy((lines, free, instances, internal(figures, constraints)), blocks)
@@ -0,0 +1,307 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from PyQt5.QtCore import QTimer
+
+from cad.figures import Point, Line
+from cad.journal import ARGUMENTS
+from cad.tracing import tracer
+from cad import solver
+
+POLL = 5
+TIMEOUT = 30.
+GRACE = .5
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Buffer(object):
+
+    def __init__(self, capacity: int, name: str = None):
+        size = (1 + 4 * capacity) * 8
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+
+        self.capacity = capacity
+        array = np.ndarray((1 + 4 * capacity, ), dtype=float, buffer=self.memory.buf)
+        self.control = array[:1]
+        self.input = array[1:1 + 2 * capacity].reshape(-1, 2)
+        self.output = array[1 + 2 * capacity:].reshape(-1, 2)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def close(self, unlink=False):
+        self.control = self.input = self.output = None
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def build(count: int, lines: list, constraints: list) -> tuple:
+    points = [Point(0., 0.) for _ in range(count)]
+    entities = {
+        'p': points,
+        'l': [Line(points[i1], points[i2]) for i1, i2 in lines],
+    }
+
+    system = solver.System(solver.Drawing(points=points))
+    for name, refs, args in constraints:
+        figures = [entities[kind][i] for kind, i in refs]
+        system.addConstraint(getattr(solver, name)(*figures, *args))
+    return points, system
+
+
+def serve(connection):
+    buffer = None
+    points, system = [], None
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+
+        if message[0] == 'topology':
+            _, name, capacity, count, lines, constraints = message
+            if buffer is None or buffer.name != name:
+                if buffer:
+                    buffer.close()
+                buffer = Buffer(capacity, name)
+            points, system = build(count, lines, constraints)
+
+        elif message[0] == 'solve':
+            seq = message[1]
+
+            def interrupt():
+                if buffer.control[0] >= seq:
+                    raise Cancelled()
+
+            system.interrupt = interrupt
+            for point, (x, y) in zip(points, buffer.input):
+                point.x, point.y = float(x), float(y)
+
+            try:
+                system.recount()
+                status = 'solved'
+            except Cancelled:
+                status = 'cancelled'
+
+            buffer.output[:len(points)] = [point.coordinates for point in points]
+            connection.send((status, seq))
+
+    if buffer:
+        buffer.close()
+
+
+class Service(object):
+
+    def __init__(self, sketch, timeout: float = TIMEOUT, report=None):
+        self.sketch = sketch
+        self.system = sketch.system
+        self.timeout = timeout
+        self.report = report
+
+        self.context = multiprocessing.get_context('spawn')
+        self.process = None
+        self.connection = None
+        self.buffer = None
+
+        self.topology = None
+        self.request = None
+        self.active = None
+        self.retried = None
+        self.points = []
+        self.seq = 0
+        self.pending = None
+        self.submitted = None
+        self.cancelled = None
+        self.dirty = False
+
+        self.timer = QTimer()
+        self.timer.setInterval(POLL)
+        self.timer.timeout.connect(self.poll)
+
+    def attach(self):
+        self.start()
+        self.system.service = self
+
+    def start(self):
+        self.connection, child = self.context.Pipe()
+        self.process = self.context.Process(target=serve, args=(child, ), daemon=True)
+        self.process.start()
+        child.close()
+        self.topology = None
+
+    def stop(self):
+        self.timer.stop()
+        if self.process:
+            if self.process.is_alive():
+                try:
+                    self.connection.send(None)
+                except OSError:
+                    pass
+                self.process.join(GRACE)
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join()
+            self.connection.close()
+            self.process = None
+        self.pending = None
+        self.request = None
+        self.active = None
+
+    def close(self):
+        self.stop()
+        self.system.service = None
+        if self.buffer:
+            self.buffer.close(unlink=True)
+            self.buffer = None
+
+    def restart(self, failure: str, crashed: bool = False):
+        request, dirty = self.active, self.dirty
+        retry = crashed and request is not None and request != self.retried
+        self.stop()
+        self.start()
+        self.dirty = False
+
+        if retry:
+            self.retried = request
+        else:
+            self.drop(request, failure)
+        if retry or dirty:
+            self.submit()
+
+    def drop(self, request, failure: str):
+        self.request = request
+        if self.report:
+            self.report('{}, solve dropped'.format(failure))
+
+    def encode(self) -> tuple:
+        points = {}
+        for constraint in self.system.constraints:
+            points.update(dict.fromkeys(constraint.points))
+        points = list(points)
+        indices = {point: i for i, point in enumerate(points)}
+
+        lines = {}
+        constraints = []
+        for constraint in self.system.constraints:
+            refs = []
+            for entity in constraint.entities:
+                if isinstance(entity, Line):
+                    if entity not in lines:
+                        lines[entity] = len(lines)
+                    refs.append(('l', lines[entity]))
+                else:
+                    refs.append(('p', indices[entity]))
+            name = type(constraint).__name__
+            args = [getattr(constraint, arg) for arg in ARGUMENTS.get(name, ())]
+            constraints.append((name, refs, args))
+
+        lines = [(indices[line.p1], indices[line.p2]) for line in lines]
+        return points, lines, constraints
+
+    def send(self, message) -> bool:
+        try:
+            self.connection.send(message)
+            return True
+        except OSError:
+            return False
+
+    def submit(self, retry=True):
+        if self.pending is not None:
+            self.dirty = True
+            self.cancel()
+            return
+
+        points, lines, constraints = self.encode()
+        request = lines, constraints, [point.coordinates for point in points]
+        if request == self.request:
+            return
+
+        if self.buffer is None or self.buffer.capacity < len(points):
+            if self.buffer:
+                self.buffer.close(unlink=True)
+            self.buffer = Buffer(max(2 * len(points), 64))
+            self.topology = None
+
+        topology = (lines, constraints)
+        if topology != self.topology:
+            message = 'topology', self.buffer.name, self.buffer.capacity, len(points), lines, constraints
+            if not self.send(message):
+                return self.retry(retry)
+            self.topology = topology
+
+        self.seq += 1
+        self.points = points
+        self.buffer.input[:len(points)] = request[2]
+        if not self.send(('solve', self.seq)):
+            return self.retry(retry)
+
+        self.pending = self.seq
+        self.active = request
+        self.submitted = time.perf_counter()
+        self.cancelled = None
+        self.timer.start()
+
+    def retry(self, retry: bool):
+        self.stop()
+        self.start()
+        if retry:
+            self.submit(False)
+        elif self.report:
+            self.report('Solver unavailable, solve dropped')
+
+    def cancel(self):
+        if self.pending is not None and self.cancelled is None:
+            self.buffer.control[0] = self.pending
+            self.cancelled = time.perf_counter()
+
+    def poll(self):
+        if self.pending is None:
+            return self.timer.stop()
+
+        try:
+            while self.connection.poll():
+                status, seq = self.connection.recv()
+                if seq == self.pending:
+                    return self.finish(status)
+        except (EOFError, OSError):
+            return self.restart('Solver crashed', crashed=True)
+
+        now = time.perf_counter()
+        if not self.process.is_alive():
+            self.restart('Solver crashed', crashed=True)
+        elif self.cancelled is not None and now - self.cancelled > GRACE:
+            self.restart('Solver ignored cancel')
+        elif now - self.submitted > self.timeout:
+            self.restart('Solver timed out')
+
+    def finish(self, status: str):
+        request, self.active = self.active, None
+        self.pending = None
+        self.timer.stop()
+
+        if tracer.enabled:
+            tracer.record('recount', 'solve', self.submitted, time.perf_counter())
+
+        if status == 'solved' and not self.dirty:
+            moved = self.system.place(self.points, self.buffer.output[:len(self.points)])
+            self.sketch.reindex(moved)
+            self.sketch.update(recount=False)
+
+            lines, constraints = self.topology
+            self.request = lines, constraints, [point.coordinates for point in self.points]
+        elif status == 'cancelled' and not self.dirty:
+            self.request = request
+
+        if self.dirty:
+            self.dirty = False
+            self.submit()
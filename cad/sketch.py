@@ -1,7 +1,49 @@
+from contextlib import contextmanager
+
 from PyQt5 import QtCore, QtGui, QtWidgets
 
 from cad.solver import *
-from cad import pen
+from cad.blocks import Block, Instance
+from cad.journal import ARGUMENTS
+from cad.tracing import tracer
+from cad import pen, selection
+
+PASTE_OFFSET = 20.
+MARGIN = pen.ACTIVE_WIDTH + 1
+OVERLAY = QtCore.QRect(0, 0, 320, 30)
+
+
+def region(points) -> QtCore.QRect:
+    xs = [point.x for point in points]
+    ys = [point.y for point in points]
+    rect = QtCore.QRectF(QtCore.QPointF(min(xs), min(ys)), QtCore.QPointF(max(xs), max(ys)))
+    return rect.adjusted(-MARGIN, -MARGIN, MARGIN, MARGIN).toAlignedRect()
+
+
+def capture(drawing) -> tuple:
+    lines = [(line, line.p1, line.p2) for line in drawing.lines]
+    coordinates = [(point, point.x, point.y) for point in drawing.system.points]
+    constraints = dict(drawing.system.constraints)
+    arguments = [[getattr(c, name) for name in ARGUMENTS.get(type(c).__name__, ())] for c in constraints]
+    return lines, coordinates, list(drawing.points), constraints, arguments
+
+
+def recover(drawing, state: tuple):
+    lines, coordinates, points, constraints, arguments = state
+
+    for line, p1, p2 in lines:
+        line.p1, line.p2 = p1, p2
+    for point, x, y in coordinates:
+        point.x, point.y = x, y
+
+    drawing.lines = [line for line, _, _ in lines]
+    drawing.points = points
+    drawing.system.countUses()
+    drawing.system.restore(constraints)
+
+    for constraint, values in zip(constraints, arguments):
+        for name, value in zip(ARGUMENTS.get(type(constraint).__name__, ()), values):
+            setattr(constraint, name, value)
 
 
 class Sketch(QtWidgets.QWidget):
@@ -11,6 +53,7 @@ class Sketch(QtWidgets.QWidget):
 
         self.lines = []
         self.points = []
+        self.instances = []
 
         self.currentPos = None
         self.pressedPos = None
@@ -18,14 +61,213 @@ class Sketch(QtWidgets.QWidget):
         self.handler = DisableHandler()
         self.system = System(self)
 
+        self.selection = []
+        self.band = None
+        self.index = None
+        self.feedback = QtCore.QRect()
+        self.changed = False
+        self.clipboard = None
+
+        self.transactions = 0
+
+        self.batching = False
+        self.overlay = False
+        self.recorder = None
+        self.journal = None
+
         self.setMouseTracking(True)
         self.setWindowTitle('Sketch')
 
     def addLine(self, line: Line):
         self.lines.append(line)
+        self.system.use(line.points)
+        self.index = None
+        if self.journal:
+            self.journal.addLine(line)
 
     def addPoint(self, point: Point):
         self.points.append(point)
+        self.system.use([point])
+        self.index = None
+        if self.journal:
+            self.journal.addPoint(point)
+
+    def addLines(self, lines):
+        self.lines.extend(lines)
+        self.system.use(point for line in lines for point in line.points)
+        self.index = None
+        if self.journal:
+            for line in lines:
+                self.journal.addLine(line)
+
+    def addPoints(self, points):
+        self.points.extend(points)
+        self.system.use(points)
+        self.index = None
+        if self.journal:
+            for point in points:
+                self.journal.addPoint(point)
+
+    def setLineEnd(self, line: Line, point: Point):
+        before = region(line.points)
+        previous = line.p2
+        self.system.release([previous])
+        line.p2 = point
+        self.system.use([point])
+        self.changed = True
+        if self.index:
+            self.index.remove(line)
+            self.index.insert(line)
+        self.updateRect(before.united(region(line.points)))
+        if self.journal:
+            self.journal.setLineEnd(line, previous)
+
+    def addInstance(self, instance: Instance):
+        self.instances.append(instance)
+        self.system.use([instance.origin])
+
+    def removeInstance(self, instance: Instance):
+        self.instances.remove(instance)
+        self.system.release([instance.origin])
+        self.system.removeEntity(instance.origin)
+
+    def removeLine(self, line: Line):
+        self.lines.remove(line)
+        self.system.release(line.points)
+        self.index = None
+        self.system.removeEntity(line)
+        if self.journal:
+            self.journal.remove(line)
+
+    def removePoint(self, point: Point):
+        self.points.remove(point)
+        self.system.release([point])
+        self.index = None
+        self.system.removeEntity(point)
+        if self.journal:
+            self.journal.remove(point)
+
+    def removeFigures(self, figures):
+        figures = set(figures)
+
+        for line in self.lines:
+            if line in figures:
+                self.system.release(line.points)
+        self.system.release(point for point in self.points if point in figures)
+        self.system.release(i.origin for i in self.instances if i in figures)
+
+        self.lines = [line for line in self.lines if line not in figures]
+        self.points = [point for point in self.points if point not in figures]
+        self.instances = [i for i in self.instances if i not in figures]
+        self.selection = [figure for figure in self.selection if figure not in figures]
+        self.index = None
+
+        entities = [f.origin if isinstance(f, Instance) else f for f in figures]
+        self.system.removeEntities(entities)
+
+        if self.journal:
+            for figure in figures:
+                self.journal.remove(figure)
+
+        self.update()
+
+    def moveFigures(self, figures, dx: float, dy: float, recount=True):
+        points = selection.translate(figures, dx, dy)
+        self.reindex(points)
+        self.changed = True
+
+        if self.journal:
+            self.journal.move(points)
+
+        self.update(recount)
+
+    def copySelection(self):
+        self.copyFigures(self.selection)
+
+    def copyFigures(self, figures):
+        lines, points, instances, constraints = selection.duplicate(figures, self.system.constraints)
+        self.clipboard = lines + points + instances, constraints
+
+    def pasteFigures(self) -> list:
+        if not self.clipboard:
+            return []
+
+        figures, constraints = self.clipboard
+        selection.translate(figures, PASTE_OFFSET, PASTE_OFFSET)
+        lines, points, instances, constraints = selection.duplicate(figures, constraints)
+
+        self.addLines(lines)
+        self.addPoints(points)
+        for instance in instances:
+            self.addInstance(instance)
+        for constraint in constraints:
+            self.system.addConstraint(constraint)
+
+        self.selection = lines + points + instances
+        self.update()
+        return self.selection
+
+    def spatialIndex(self) -> selection.Grid:
+        if self.index is None:
+            self.index = selection.Grid().build(self.lines, self.points)
+        return self.index
+
+    def reindex(self, points):
+        if self.index is None:
+            return
+        for figure in self.index.touching(points):
+            self.index.remove(figure)
+            self.index.insert(figure)
+
+    def selectRect(self, rect: QtCore.QRectF) -> list:
+        area = rect.normalized()
+        self.selection = self.spatialIndex().query(area)
+        self.selection += [i for i in self.instances if area.contains(i.origin.toQtPoint())]
+        return self.selection
+
+    @contextmanager
+    def transaction(self):
+        state = self.snapshot()
+        self.transactions += 1
+        if self.journal:
+            self.journal.begin()
+
+        try:
+            yield self
+        except BaseException:
+            self.transactions -= 1
+            self.restore(state)
+            if self.journal:
+                self.journal.rollback()
+            self.update(recount=False)
+            raise
+
+        self.transactions -= 1
+        if self.journal:
+            self.journal.commit()
+        self.update(recount=self.snapshot()[:3] != state[:3])
+
+    def snapshot(self) -> tuple:
+        instances = [(instance, instance.origin, instance.angle) for instance in self.instances]
+        blocks = {id(instance.block): instance.block for instance in self.instances}
+        blocks = [(block, capture(block)) for block in blocks.values()]
+        return capture(self), instances, blocks, list(self.selection)
+
+    def restore(self, state: tuple):
+        drawing, instances, blocks, figures = state
+
+        for instance, origin, angle in instances:
+            instance.origin, instance.angle = origin, angle
+        self.instances = [instance for instance, _, _ in instances]
+        self.selection = figures
+
+        recover(self, drawing)
+        self.index = None
+
+        for block, captured in blocks:
+            if capture(block) != captured:
+                recover(block, captured)
+                block.invalidate()
 
     def isMousePressed(self) -> bool:
         return self.pressedPos is not None
@@ -36,86 +278,266 @@ class Sketch(QtWidgets.QWidget):
     def getPressedPosition(self) -> Point:
         return self.pressedPos
 
+    def figuresNear(self, point: Point, radius: float) -> list:
+        rect = QtCore.QRectF(point.x - radius, point.y - radius, 2 * radius, 2 * radius)
+        return self.spatialIndex().intersecting(rect)
+
     def getActiveLine(self):
-        for line in self.lines:
-            if line.hasPoint(self.currentPos, 4):
-                return line
+        if self.currentPos is None:
+            return False
+        with tracer.span('getActiveLine', 'hit-test'):
+            for line in self.figuresNear(self.currentPos, 4):
+                if isinstance(line, Line) and line.hasPoint(self.currentPos, 4):
+                    return line
         return False
 
     def getActivePoint(self):
-        for line in self.lines:
-            for point in line.points:
-                if point.distToPoint(self.currentPos) < 4:
-                    return point
-        for point in self.points:
-            if point.distToPoint(self.currentPos) < 4:
-                return point
+        if self.currentPos is None:
+            return False
+        with tracer.span('getActivePoint', 'hit-test'):
+            for figure in self.figuresNear(self.currentPos, 4):
+                points = figure.points if isinstance(figure, Line) else (figure, )
+                for point in points:
+                    if point.distToPoint(self.currentPos) < 4:
+                        return point
+            for instance in self.instances:
+                if instance.origin.distToPoint(self.currentPos) < 4:
+                    return instance.origin
         return False
 
+    def perform(self, action: str):
+        if self.recorder:
+            self.recorder.record(self, 'action', action)
+
+        with tracer.span(action):
+            return getattr(self, action)()
+
     def keyPressEvent(self, event):
         keys = [QtCore.Qt.Key_Backspace, QtCore.Qt.Key_Delete]
 
-        if event.key() in keys:
-            self.removeSelectedFigure()
+        if self.recorder:
+            self.recorder.record(self, 'key', event)
 
-        self.update()
+        with tracer.span('keyPressEvent'):
+            if event.key() in keys:
+                self.removeSelection()
+
+    def removeSelection(self):
+        if self.selection:
+            self.removeFigures(self.selection)
+            return True
+
+        removed = self.removeSelectedFigure()
+        if removed:
+            self.update()
+        return removed
 
     def removeSelectedFigure(self):
         line = self.getActiveLine()
         if line:
-            self.lines.remove(line)
+            self.removeLine(line)
             return True
 
         point = self.getActivePoint()
-        if point:
-            self.points.remove(point)
+        if point in self.points:
+            self.removePoint(point)
+            return True
+
+        for instance in self.instances:
+            if point is instance.origin:
+                self.removeInstance(instance)
+                return True
 
     def mousePressEvent(self, event):
-        position = event.localPos()
-        self.pressedPos = Point.fromQtPoint(position)
+        if self.recorder:
+            self.recorder.record(self, 'press', event)
 
-        self.handler.mousePressed(self)
+        with tracer.span('mousePressEvent'):
+            position = event.localPos()
+            self.pressedPos = Point.fromQtPoint(position)
+
+            with tracer.span(type(self.handler).__name__ + '.mousePressed', 'handler'):
+                self.handler.mousePressed(self)
 
     def mouseReleaseEvent(self, event):
-        if event.button() == QtCore.Qt.LeftButton:
-            self.pressedPos = None
+        if self.recorder:
+            self.recorder.record(self, 'release', event)
+
+        with tracer.span('mouseReleaseEvent'):
+            if event.button() == QtCore.Qt.LeftButton:
+                self.pressedPos = None
 
-        self.handler.mouseReleased(self)
+            with tracer.span(type(self.handler).__name__ + '.mouseReleased', 'handler'):
+                self.handler.mouseReleased(self)
 
     def mouseMoveEvent(self, event):
-        position = event.localPos()
-        self.currentPos = Point.fromQtPoint(position)
+        if self.recorder:
+            self.recorder.record(self, 'move', event)
 
-        self.handler.mouseMoved(self)
-        self.update()
+        with tracer.span('mouseMoveEvent'):
+            position = event.localPos()
+            self.currentPos = Point.fromQtPoint(position)
+
+            with tracer.span(type(self.handler).__name__ + '.mouseMoved', 'handler'):
+                self.handler.mouseMoved(self)
+            self.refresh()
 
     def update(self, recount=True):
+        if self.transactions:
+            return
+
         if recount:
-            self.system.recount()
+            self.changed = False
+            self.reindex(self.system.recount())
 
         super().update()
 
+    def updateRect(self, rect: QtCore.QRect):
+        if rect.isNull() or self.transactions:
+            return
+        if self.overlay:
+            super().update(OVERLAY)
+        super().update(rect)
+
+    def refresh(self):
+        if self.transactions:
+            return
+
+        if self.changed:
+            self.changed = False
+            moved = self.system.recount()
+            if moved:
+                self.reindex(moved)
+                super().update()
+
+        feedback = self.feedbackRect()
+        self.updateRect(feedback.united(self.feedback))
+        self.feedback = feedback
+
+    def feedbackRect(self) -> QtCore.QRect:
+        rect = QtCore.QRect()
+
+        figure = self.getActivePoint() or self.getActiveLine()
+        if isinstance(figure, Line):
+            rect = region(figure.points)
+        elif figure:
+            rect = region([figure])
+
+        if self.band is not None:
+            band = self.band.normalized()
+            corners = Point(band.left(), band.top()), Point(band.right(), band.bottom())
+            rect = rect.united(region(corners))
+
+        return rect
+
+    def visibleFigures(self, rect: QtCore.QRect) -> tuple:
+        if rect.contains(self.rect()):
+            return self.lines, self.points
+
+        area = QtCore.QRectF(rect).adjusted(-MARGIN, -MARGIN, MARGIN, MARGIN)
+        figures = self.spatialIndex().intersecting(area)
+        lines = [figure for figure in figures if isinstance(figure, Line)]
+        points = [figure for figure in figures if not isinstance(figure, Line)]
+        return lines, points
+
     def paintEvent(self, event):
-        painter = QtGui.QPainter()
-        painter.begin(self)
-        self.drawLines(painter)
-        self.drawPoints(painter)
-        self.drawActive(painter)
-        painter.end()
-
-    def drawLines(self, painter):
-        for line in self.lines:
+        with tracer.span('paintEvent', 'paint'):
+            lines, points = self.visibleFigures(event.rect())
+
+            painter = QtGui.QPainter()
+            painter.begin(self)
+            self.drawLines(painter, lines)
+            self.drawPoints(painter, points)
+            self.drawInstances(painter)
+            self.drawSelection(painter, lines, points)
+            self.drawActive(painter)
+            if self.overlay:
+                self.drawOverlay(painter)
+            painter.end()
+
+    def drawLines(self, painter, lines=None):
+        if lines is None:
+            lines = self.lines
+
+        if not self.batching:
+            return self.drawEachLine(painter, lines)
+
+        points = [point.toQtPoint() for line in lines for point in line.points]
+        lines = [line.toQtLine() for line in lines]
+
+        painter.setPen(pen.line)
+        painter.drawLines(lines)
+        painter.setPen(pen.point)
+        painter.drawPoints(QtGui.QPolygonF(points))
+
+    def drawEachLine(self, painter, lines):
+        for line in lines:
             painter.setPen(pen.line)
             painter.drawLine(line.toQtLine())
             painter.setPen(pen.point)
             painter.drawPoint(line.p1.toQtPoint())
             painter.drawPoint(line.p2.toQtPoint())
 
-    def drawPoints(self, painter):
-        for point in self.points:
+    def drawPoints(self, painter, points=None):
+        if points is None:
+            points = self.points
+
+        if not self.batching:
+            return self.drawEachPoint(painter, points)
+
+        points = [point.toQtPoint() for point in points]
+
+        painter.setPen(pen.point)
+        painter.drawPoints(QtGui.QPolygonF(points))
+
+    def drawEachPoint(self, painter, points):
+        for point in points:
             painter.setPen(pen.point)
             painter.drawPoint(point.toQtPoint())
 
+    def drawInstances(self, painter):
+        for instance in self.instances:
+            painter.save()
+            painter.setTransform(instance.transform(), True)
+            painter.drawPicture(0, 0, self.blockPicture(instance.block))
+            painter.restore()
+
+        self.drawPoints(painter, [instance.origin for instance in self.instances])
+
+    def blockPicture(self, block: Block) -> QtGui.QPicture:
+        if block.picture is None:
+            block.solve()
+            block.picture = QtGui.QPicture()
+            painter = QtGui.QPainter()
+            painter.begin(block.picture)
+            self.drawLines(painter, block.lines)
+            self.drawPoints(painter, block.points)
+            painter.end()
+        return block.picture
+
+    def drawSelection(self, painter, lines=None, points=None):
+        figures = self.selection
+        if lines is not None and lines is not self.lines:
+            visible = set(lines)
+            visible.update(points)
+            figures = [f for f in figures if f in visible or isinstance(f, Instance)]
+
+        for figure in figures:
+            if isinstance(figure, Line):
+                painter.setPen(pen.selectedLine)
+                painter.drawLine(figure.toQtLine())
+                painter.setPen(pen.selectedPoint)
+                painter.drawPoint(figure.p1.toQtPoint())
+                painter.drawPoint(figure.p2.toQtPoint())
+            else:
+                point = figure.origin if isinstance(figure, Instance) else figure
+                painter.setPen(pen.selectedPoint)
+                painter.drawPoint(point.toQtPoint())
+
+        if self.band is not None:
+            painter.setPen(pen.band)
+            painter.drawRect(self.band.normalized())
+
     def drawActive(self, painter):
         point = self.getActivePoint()
         if point:
@@ -130,3 +552,11 @@ class Sketch(QtWidgets.QWidget):
             painter.setPen(pen.activePoint)
             painter.drawPoint(line.p1.toQtPoint())
             painter.drawPoint(line.p2.toQtPoint())
+
+    def drawOverlay(self, painter):
+        frame = tracer.duration('paint')
+        solve = tracer.duration('solve')
+        text = 'frame {:.1f} ms, solve {:.1f} ms'.format(frame, solve)
+
+        painter.setPen(pen.overlay)
+        painter.drawText(10, 20, text)
@@ -1,64 +1,224 @@
+import math
 from abc import abstractmethod
+from typing import TYPE_CHECKING
 
-import numpy as np
-from scipy.optimize import fsolve
+from PyQt5.QtCore import QRectF
 
 from cad.figures import Point, Line
+from cad.tracing import tracer
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 class System(object):
 
     def __init__(self, sketch):
         self.sketch = sketch
-        self.constraints = []
+        self.constraints = {}
+        self.references = {}
+
+        self.variables = []
+        self.indices = {}
+        self.anchors = []
+
+        self.reducing = True
+        self.reduction = None
+
+        self.journal = None
+        self.service = None
+        self.interrupt = None
+
+        self.uses = {}
+        self.countUses()
 
     @property
     def points(self) -> list:
-        points = []
+        points = {}
         for line in self.sketch.lines:
-            points.extend(line.points)
-        for point in self.sketch.points:
-            points.append(point)
-        return points
+            points.update(dict.fromkeys(line.points))
+        points.update(dict.fromkeys(self.sketch.points))
+        points.update(dict.fromkeys(i.origin for i in self.sketch.instances))
+        return list(points)
 
     def addConstraint(self, constraint):
-        self.constraints.append(constraint)
+        self.constraints[constraint] = None
+        if self.reduction:
+            self.reduction.invalidate(constraint)
+        if self.journal:
+            self.journal.addConstraint(constraint)
+        for entity in constraint.entities:
+            self.references.setdefault(entity, set()).add(constraint)
+
+    def removeConstraint(self, constraint):
+        del self.constraints[constraint]
+        if self.reduction:
+            self.reduction.invalidate(constraint)
+        if self.journal:
+            self.journal.remove(constraint)
+        for entity in set(constraint.entities):
+            dependents = self.references[entity]
+            dependents.discard(constraint)
+            if not dependents:
+                del self.references[entity]
+
+    def restore(self, constraints: dict):
+        for constraint in list(self.constraints):
+            if constraint not in constraints:
+                self.removeConstraint(constraint)
+        for constraint in constraints:
+            if constraint not in self.constraints:
+                self.addConstraint(constraint)
+        self.constraints = dict(constraints)
+
+    def dependents(self, entity) -> set:
+        constraints = set()
+        points = (entity, )
+
+        if isinstance(entity, Line):
+            constraints.update(self.references.get(entity, ()))
+            points = entity.points
+
+        for point in points:
+            if point in self.references and not self.isUsed(point):
+                constraints.update(self.references[point])
+
+        return constraints
+
+    def use(self, points):
+        for point in points:
+            self.uses[point] = self.uses.get(point, 0) + 1
+
+    def release(self, points):
+        for point in points:
+            count = self.uses[point] - 1
+            if count:
+                self.uses[point] = count
+            else:
+                del self.uses[point]
 
-    def recount(self):
-        if len(self.x0):
+    def countUses(self):
+        self.uses = {}
+        for line in self.sketch.lines:
+            self.use(line.points)
+        self.use(self.sketch.points)
+        self.use(instance.origin for instance in self.sketch.instances)
+
+    def isUsed(self, point: Point) -> bool:
+        return point in self.uses
+
+    def removeEntity(self, entity):
+        for constraint in self.dependents(entity):
+            self.removeConstraint(constraint)
+
+    def removeEntities(self, entities):
+        constraints = set()
+        for entity in entities:
+            constraints.update(self.dependents(entity))
+        for constraint in constraints:
+            self.removeConstraint(constraint)
+
+    def recount(self) -> list:
+        if not self.constraints:
+            return []
+
+        if self.service:
+            self.service.submit()
+            return []
+
+        if self.reducing:
+            with tracer.span('recount', 'solve'):
+                result = self.reduce()
+            if result:
+                return self.place(*result)
+
+        self.compile()
+        with tracer.span('recount', 'solve'):
             result = self.solve()
-            if result[2] == 1:
-                y = [round(y, 1) for y in result[0]]
-                for i, point in enumerate(self.points):
-                    for j, prop in enumerate(('x', 'y')):
-                        n = i * 2 + j
-                        setattr(point, prop, y[n])
-
-    def solve(self):
-        result = fsolve(self.system, self.x0, full_output=True, xtol=1e-2)
+        if result[2] == 1:
+            x = result[0]
+            return self.place(self.variables, zip(x[0::2], x[1::2]))
+        return []
+
+    def place(self, points, coordinates) -> list:
+        moved = []
+        for point, (x, y) in zip(points, coordinates):
+            x, y = round(float(x), 1), round(float(y), 1)
+            if point.x != x or point.y != y:
+                point.x, point.y = x, y
+                moved.append(point)
+
+        if moved and self.journal:
+            self.journal.move(moved)
+        return moved
+
+    def reduce(self):
+        from cad.clusters import Reduction
+
+        if self.reduction is None:
+            self.reduction = Reduction(self)
+        return self.reduction.solve()
+
+    def compile(self):
+        self.variables = self.points
+        self.indices = {point: i for i, point in enumerate(self.variables)}
+        self.anchor()
+
+    def anchor(self):
+        import numpy as np
+
+        coordinates = [c for point in self.variables for c in point.coordinates]
+        self.anchors = np.array(coordinates, dtype=float)
+
+    def index(self, point: Point) -> int:
+        return self.indices[point]
+
+    def assign(self, x):
+        for i, point in enumerate(self.variables):
+            point.x = x[i * 2]
+            point.y = x[i * 2 + 1]
+
+    def solve(self, x0: 'np.ndarray' = None, xtol: float = 1e-2):
+        from scipy.optimize import fsolve
+
+        if x0 is None:
+            x0 = self.x0
+        result = fsolve(self.system, x0, full_output=True, xtol=xtol)
         return result
 
-    def system(self, x: np.ndarray) -> np.ndarray:
+    def system(self, x: 'np.ndarray') -> 'np.ndarray':
+        import numpy as np
+
+        if self.interrupt:
+            self.interrupt()
+
         y = np.zeros(shape=x.shape, dtype=x.dtype)
 
-        for i, point in enumerate(self.points):
-            for j, coordinate in enumerate(point.coordinates):
-                n = i * 2 + j
-                y[n] = 2 * (x[n] - coordinate)
+        size = len(self.anchors)
+        y[:size] = 2 * (x[:size] - self.anchors)
 
         for i, constraint in enumerate(self.constraints):
-            n = len(self.points) * 2 + i
-            constraint.apply(self, x, y, n)
+            constraint.apply(self, x, y, size + i)
 
         return y
 
     @property
-    def x0(self) -> np.ndarray:
-        size = len(self.points) * 2 + len(self.constraints)
+    def x0(self) -> 'np.ndarray':
+        import numpy as np
+
+        size = len(self.anchors) + len(self.constraints)
         y = np.zeros(shape=(size, ), dtype=float)
         return y
 
 
+class Drawing(object):
+
+    def __init__(self, lines=(), points=(), instances=()):
+        self.lines = list(lines)
+        self.points = list(points)
+        self.instances = list(instances)
+
+
 class Handler:
 
     def mouseMoved(self, sketch):
@@ -75,6 +235,43 @@ class DisableHandler(Handler):
     pass
 
 
+class SelectionHandler(Handler):
+
+    def __init__(self):
+        self.grabbed = None
+
+    def mousePressed(self, sketch):
+        selected = set(sketch.selection)
+        figures = sketch.getActivePoint(), sketch.getActiveLine()
+
+        if any(figure in selected for figure in figures if figure):
+            self.grabbed = sketch.getPressedPosition()
+        else:
+            position = sketch.getPressedPosition().toQtPoint()
+            sketch.band = QRectF(position, position)
+
+    def mouseMoved(self, sketch):
+        if not sketch.isMousePressed():
+            return
+
+        position = sketch.getCurrentPosition()
+        if self.grabbed:
+            dx = position.x - self.grabbed.x
+            dy = position.y - self.grabbed.y
+            sketch.moveFigures(sketch.selection, dx, dy, recount=False)
+            self.grabbed = position
+        elif sketch.band is not None:
+            sketch.band.setBottomRight(position.toQtPoint())
+
+    def mouseReleased(self, sketch):
+        if self.grabbed:
+            self.grabbed = None
+        elif sketch.band is not None:
+            sketch.selectRect(sketch.band)
+            sketch.band = None
+        sketch.update(recount=False)
+
+
 class LineDrawing(Handler):
 
     def mousePressed(self, sketch):
@@ -86,7 +283,7 @@ class LineDrawing(Handler):
 
     def mouseMoved(self, sketch):
         if sketch.isMousePressed():
-            sketch.lines[-1].p2 = sketch.getCurrentPosition()
+            sketch.setLineEnd(sketch.lines[-1], sketch.getCurrentPosition())
 
 
 class PointDrawing(Handler):
@@ -99,8 +296,25 @@ class PointDrawing(Handler):
 
 class Constraint(object):
 
+    parameter = None
+    absolute = False
+
+    @property
+    def entities(self) -> tuple:
+        return ()
+
+    @property
+    def points(self) -> tuple:
+        points = []
+        for entity in self.entities:
+            if isinstance(entity, Line):
+                points.extend(entity.points)
+            else:
+                points.append(entity)
+        return tuple(points)
+
     @abstractmethod
-    def apply(self, system: System, x: np.ndarray, y: np.ndarray, n: int):
+    def apply(self, system: System, x: 'np.ndarray', y: 'np.ndarray', n: int):
         pass
 
 
@@ -110,6 +324,10 @@ class Parallel(Constraint):
         self.l1 = l1
         self.l2 = l2
 
+    @property
+    def entities(self) -> tuple:
+        return self.l1, self.l2
+
     @property
     def p1(self) -> Point:
         return self.l1.p1
@@ -126,11 +344,11 @@ class Parallel(Constraint):
     def p4(self) -> Point:
         return self.l2.p2
 
-    def apply(self, system: System, x: np.ndarray, y: np.ndarray, n: int):
-        i1 = system.points.index(self.p1) * 2
-        i2 = system.points.index(self.p2) * 2
-        i3 = system.points.index(self.p3) * 2
-        i4 = system.points.index(self.p4) * 2
+    def apply(self, system: System, x: 'np.ndarray', y: 'np.ndarray', n: int):
+        i1 = system.index(self.p1) * 2
+        i2 = system.index(self.p2) * 2
+        i3 = system.index(self.p3) * 2
+        i4 = system.index(self.p4) * 2
 
         y[i1] -= (x[i4 + 1] - x[i3 + 1]) * x[n]
         y[i2] += (x[i4 + 1] - x[i3 + 1]) * x[n]
@@ -167,10 +385,16 @@ class ParallelHandler(Handler):
 
 class Length(Constraint):
 
+    parameter = 'length'
+
     def __init__(self, line: Line, length: float):
         self.line = line
         self.length = length
 
+    @property
+    def entities(self) -> tuple:
+        return self.line,
+
     @property
     def p1(self) -> Point:
         return self.line.p1
@@ -179,9 +403,9 @@ class Length(Constraint):
     def p2(self) -> Point:
         return self.line.p2
 
-    def apply(self, system: System, x: np.ndarray, y: np.ndarray, n: int):
-        i1 = system.points.index(self.p1) * 2
-        i2 = system.points.index(self.p2) * 2
+    def apply(self, system: System, x: 'np.ndarray', y: 'np.ndarray', n: int):
+        i1 = system.index(self.p1) * 2
+        i2 = system.index(self.p2) * 2
 
         dx = x[i2] - x[i1]
         dy = x[i2 + 1] - x[i1 + 1]
@@ -223,12 +447,18 @@ class AngleHandler(Handler):
 
 class FixingX(Constraint):
 
+    absolute = True
+
     def __init__(self, point: Point, value: float):
         self.point = point
         self.value = value
 
-    def apply(self, system: System, x: np.ndarray, y: np.ndarray, n: int):
-        i = system.points.index(self.point) * 2
+    @property
+    def entities(self) -> tuple:
+        return self.point,
+
+    def apply(self, system: System, x: 'np.ndarray', y: 'np.ndarray', n: int):
+        i = system.index(self.point) * 2
 
         y[i] += x[n]
 
@@ -237,12 +467,18 @@ class FixingX(Constraint):
 
 class FixingY(Constraint):
 
+    absolute = True
+
     def __init__(self, point: Point, value: float):
         self.point = point
         self.value = value
 
-    def apply(self, system: System, x: np.ndarray, y: np.ndarray, n: int):
-        i = system.points.index(self.point) * 2 + 1
+    @property
+    def entities(self) -> tuple:
+        return self.point,
+
+    def apply(self, system: System, x: 'np.ndarray', y: 'np.ndarray', n: int):
+        i = system.index(self.point) * 2 + 1
 
         y[i] += x[n]
 
@@ -264,9 +500,24 @@ class FixingHandler(Handler):
 
 class Angle(Constraint):
 
+    parameter = 'angle'
+
     def __init__(self, line: Line, angle: float):
         self.line = line
-        self.tan = np.tan(angle * np.pi / 180)
+        self.angle = angle
+
+    @property
+    def angle(self) -> float:
+        return self.__angle
+
+    @angle.setter
+    def angle(self, angle: float):
+        self.__angle = angle
+        self.tan = math.tan(math.radians(angle))
+
+    @property
+    def entities(self) -> tuple:
+        return self.line,
 
     @property
     def p1(self) -> Point:
@@ -276,15 +527,15 @@ class Angle(Constraint):
     def p2(self) -> Point:
         return self.line.p2
 
-    def apply(self, system: System, x: np.ndarray, y: np.ndarray, n: int):
-        i1 = system.points.index(self.p1) * 2
-        i2 = system.points.index(self.p2) * 2
+    def apply(self, system: System, x: 'np.ndarray', y: 'np.ndarray', n: int):
+        i1 = system.index(self.p1) * 2
+        i2 = system.index(self.p2) * 2
 
-        y[i2] += x[n]
-        y[i1] -= x[n]
+        y[i2] -= x[n] * self.tan
+        y[i1] += x[n] * self.tan
 
-        y[i2 + 1] += x[n] * self.tan
-        y[i1 + 1] -= x[n] * self.tan
+        y[i2 + 1] += x[n]
+        y[i1 + 1] -= x[n]
 
         y[n] = x[i2 + 1] - x[i1 + 1] - (x[i2] - x[i1]) * self.tan
 
@@ -313,6 +564,10 @@ class Vertical(Constraint, Handler):
     def __init__(self, line: Line):
         self.line = line
 
+    @property
+    def entities(self) -> tuple:
+        return self.line,
+
     @property
     def p1(self) -> Point:
         return self.line.p1
@@ -321,9 +576,9 @@ class Vertical(Constraint, Handler):
     def p2(self) -> Point:
         return self.line.p2
 
-    def apply(self, system: System, x: np.ndarray, y: np.ndarray, n: int):
-        i1 = system.points.index(self.p1) * 2
-        i2 = system.points.index(self.p2) * 2
+    def apply(self, system: System, x: 'np.ndarray', y: 'np.ndarray', n: int):
+        i1 = system.index(self.p1) * 2
+        i2 = system.index(self.p2) * 2
 
         y[i2] += x[n]
         y[i1] -= x[n]
@@ -336,6 +591,10 @@ class Horizontal(Constraint):
     def __init__(self, line: Line):
         self.line = line
 
+    @property
+    def entities(self) -> tuple:
+        return self.line,
+
     @property
     def p1(self) -> Point:
         return self.line.p1
@@ -344,9 +603,9 @@ class Horizontal(Constraint):
     def p2(self) -> Point:
         return self.line.p2
 
-    def apply(self, system: System, x: np.ndarray, y: np.ndarray, n: int):
-        i1 = system.points.index(self.p1) * 2 + 1
-        i2 = system.points.index(self.p2) * 2 + 1
+    def apply(self, system: System, x: 'np.ndarray', y: 'np.ndarray', n: int):
+        i1 = system.index(self.p1) * 2 + 1
+        i2 = system.index(self.p2) * 2 + 1
 
         y[i2] += x[n]
         y[i1] -= x[n]
@@ -379,9 +638,13 @@ class CoincidentX(Constraint):
         self.p1 = p1
         self.p2 = p2
 
-    def apply(self, system: System, x: np.ndarray, y: np.ndarray, n: int):
-        i1 = system.points.index(self.p1) * 2
-        i2 = system.points.index(self.p2) * 2
+    @property
+    def entities(self) -> tuple:
+        return self.p1, self.p2
+
+    def apply(self, system: System, x: 'np.ndarray', y: 'np.ndarray', n: int):
+        i1 = system.index(self.p1) * 2
+        i2 = system.index(self.p2) * 2
 
         y[i2] += x[n]
         y[i1] -= x[n]
@@ -395,9 +658,13 @@ class CoincidentY(Constraint):
         self.p1 = p1
         self.p2 = p2
 
-    def apply(self, system: System, x: np.ndarray, y: np.ndarray, n: int):
-        i1 = system.points.index(self.p1) * 2 + 1
-        i2 = system.points.index(self.p2) * 2 + 1
+    @property
+    def entities(self) -> tuple:
+        return self.p1, self.p2
+
+    def apply(self, system: System, x: 'np.ndarray', y: 'np.ndarray', n: int):
+        i1 = system.index(self.p1) * 2 + 1
+        i2 = system.index(self.p2) * 2 + 1
 
         y[i2] += x[n]
         y[i1] -= x[n]
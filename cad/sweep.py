@@ -0,0 +1,78 @@
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from cad.solver import System, Drawing
+
+
+def grid(*axes) -> np.ndarray:
+    mesh = np.meshgrid(*axes, indexing='ij')
+    return np.stack([axis.ravel() for axis in mesh], axis=-1)
+
+
+def sweep(sketch, constraints: list, values, processes: int = None, xtol: float = 1e-6) -> np.ndarray:
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+
+    for constraint in constraints:
+        if constraint.parameter is None:
+            raise ValueError('%s has no parameter to sweep' % type(constraint).__name__)
+
+    drawing = Drawing(sketch.lines, sketch.points, sketch.instances)
+    if not len(values):
+        return np.empty((0, len(System(drawing).points), 2))
+
+    if values.shape[1] != len(constraints):
+        raise ValueError('Expected one value column per constraint')
+
+    known = list(sketch.system.constraints)
+    positions = [known.index(constraint) for constraint in constraints]
+    problem = drawing, known, positions, xtol
+
+    processes = min(processes or os.cpu_count() or 1, len(values))
+    chunks = np.array_split(values, processes)
+
+    if processes == 1:
+        results = [solveChunk(copy.deepcopy(problem), chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(solveChunk, repeat(problem), chunks))
+
+    return np.concatenate(results)
+
+
+def solveChunk(problem: tuple, values: np.ndarray) -> np.ndarray:
+    drawing, constraints, positions, xtol = problem
+
+    system = System(drawing)
+    for constraint in constraints:
+        system.addConstraint(constraint)
+
+    parameterized = [constraints[i] for i in positions]
+
+    system.compile()
+    anchors = system.anchors
+    x0 = cold = system.x0
+    x0[:len(anchors)] = anchors
+
+    result = np.full((len(values), len(system.variables), 2), np.nan)
+
+    for n, sample in enumerate(values):
+        for constraint, value in zip(parameterized, sample):
+            setattr(constraint, constraint.parameter, value)
+
+        system.anchor()
+        x, _, ier, _ = system.solve(x0, xtol)
+        if ier != 1:
+            system.anchors = anchors
+            x, _, ier, _ = system.solve(cold, xtol)
+        if ier == 1:
+            system.assign(x)
+            result[n] = np.reshape(x[:len(system.anchors)], (-1, 2))
+            x0 = x
+
+    return result
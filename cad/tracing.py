@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span(object):
+
+    def __init__(self, tracer, name: str, category: str):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        end = time.perf_counter()
+        self.tracer.record(self.name, self.category, self.start, end)
+        return False
+
+
+class Tracer(object):
+
+    def __init__(self, capacity: int = 65536):
+        self.enabled = False
+        self.spans = deque(maxlen=capacity)
+        self.latest = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self.spans.clear()
+        self.latest.clear()
+
+    def span(self, name: str, category: str = 'event'):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category)
+
+    def record(self, name: str, category: str, start: float, end: float):
+        self.spans.append((name, category, start, end, threading.get_ident()))
+        self.latest[category] = end - start
+
+    def duration(self, category: str) -> float:
+        return self.latest.get(category, 0.) * 1000
+
+    def events(self) -> list:
+        pid = os.getpid()
+        events = []
+        for name, category, start, end, tid in self.spans:
+            events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': start * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': pid,
+                'tid': tid,
+            })
+        return events
+
+    def export(self, path: str):
+        trace = {
+            'traceEvents': self.events(),
+            'displayTimeUnit': 'ms',
+        }
+        with open(path, 'w') as fp:
+            json.dump(trace, fp)
+
+
+tracer = Tracer()
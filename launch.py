@@ -1,13 +1,93 @@
 #!/usr/bin/env python
 
+import time
+
+started = time.perf_counter()
+
+import argparse
 import sys
+from PyQt5.QtCore import QObject, QEvent, QTimer
 from PyQt5.QtWidgets import QApplication
 
 from cad.application import Application
+from cad.journal import Journal
+from cad.recording import Recorder
+from cad.tracing import tracer
+
+imported = time.perf_counter()
+
+
+class FirstPaint(QObject):
+
+    def __init__(self, app: QApplication):
+        super().__init__()
+        self.app = app
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            watched.removeEventFilter(self)
+            QTimer.singleShot(0, self.report)
+        return False
+
+    def report(self):
+        painted = time.perf_counter()
+        print('imports       {:8.1f} ms'.format((imported - started) * 1000))
+        print('first paint   {:8.1f} ms'.format((painted - started) * 1000))
+        print('scipy loaded  {!s:>8}'.format('scipy' in sys.modules))
+        self.app.exit(0)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trace', metavar='FILE', help='write Chrome trace-event JSON on exit')
+    parser.add_argument('--overlay', action='store_true', help='show frame and solve time')
+    parser.add_argument('--record', metavar='FILE', help='record the input session on exit')
+    parser.add_argument('--autosave', metavar='FILE', help='journal edits to FILE and recover them on start')
+    parser.add_argument('--solver-service', action='store_true', help='solve in a separate process')
+    parser.add_argument('--startup-time', action='store_true', help='report time to first paint and exit')
+    return parser.parse_known_args()
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    args, qtArgs = parseArguments()
+
+    if args.trace or args.overlay:
+        tracer.enable()
+
+    app = QApplication(sys.argv[:1] + qtArgs)
     workspace = Application()
+    workspace.sketch.overlay = args.overlay
+
+    if args.solver_service:
+        from cad.service import Service
+        service = Service(workspace.sketch, report=workspace.statusBar().showMessage)
+        service.attach()
+
+    if args.autosave:
+        journal = Journal(args.autosave)
+        journal.attach(workspace.sketch)
+
+    if args.record:
+        recorder = Recorder()
+        recorder.attach(workspace.sketch)
+
+    if args.startup_time:
+        firstPaint = FirstPaint(app)
+        workspace.sketch.installEventFilter(firstPaint)
+
     workspace.show()
-    sys.exit(app.exec_())
+    code = app.exec_()
+
+    if args.trace:
+        tracer.export(args.trace)
+
+    if args.record:
+        recorder.save(args.record, workspace.sketch)
+
+    if args.autosave:
+        journal.close()
+
+    if args.solver_service:
+        service.close()
+
+    sys.exit(code)
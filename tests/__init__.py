@@ -0,0 +1,13 @@
+import os
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication
+
+app = None
+
+
+def application() -> QApplication:
+    global app
+    app = QApplication.instance() or QApplication([])
+    return app
@@ -0,0 +1,157 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from cad import clusters
+from cad.solver import *
+
+
+def triangle() -> tuple:
+    a, b, c = Point(0, 0), Point(30, 5), Point(10, 40)
+    lines = [Line(a, b), Line(b, c), Line(c, a)]
+    constraints = [
+        Length(lines[0], 50), Length(lines[1], 40), Length(lines[2], 30),
+        FixingX(a, 5), FixingY(a, 7), Horizontal(lines[0]),
+    ]
+    return Drawing(lines), constraints
+
+
+def linkage() -> tuple:
+    corners = [(0, 0), (10, 20), (40, 25), (50, 0)]
+    bars = [Line(Point(*corners[i]), Point(*corners[i + 1])) for i in range(3)]
+    constraints = [Length(bars[0], 22), Length(bars[1], 33), Length(bars[2], 26)]
+    for first, second in zip(bars, bars[1:]):
+        constraints += [CoincidentX(first.p2, second.p1), CoincidentY(first.p2, second.p1)]
+    constraints += [
+        FixingX(bars[0].p1, 0), FixingY(bars[0].p1, 0),
+        FixingX(bars[2].p2, 50), FixingY(bars[2].p2, 0),
+    ]
+    return Drawing(bars), constraints
+
+
+def chain(count: int) -> tuple:
+    drawing, constraints = Drawing(), []
+    previous = None
+    for i in range(count):
+        a, b, c = Point(i * 30, 0), Point(i * 30 + 25, 3), Point(i * 30 + 10, 20)
+        lines = [Line(a, b), Line(b, c), Line(c, a)]
+        drawing.lines += lines
+        constraints += [Length(lines[0], 25), Length(lines[1], 24), Length(lines[2], 22)]
+        if previous:
+            constraints += [CoincidentX(previous, a), CoincidentY(previous, a)]
+        previous = b
+    constraints += [FixingX(drawing.lines[0].p1, 0), FixingY(drawing.lines[0].p1, 0)]
+    return drawing, constraints
+
+
+def isosceles(*extra) -> tuple:
+    a, b, c = Point(0, 0), Point(30, 0), Point(15, 20)
+    lines = [Line(a, b), Line(b, c), Line(c, a)]
+    constraints = [FixingX(a, 0), FixingY(a, 0), Length(lines[0], 30), Length(lines[1], 25), Length(lines[2], 25)]
+    constraints += [kind(lines[0]) for kind in extra]
+    return Drawing(lines), constraints
+
+
+def flipped(reducing: bool, *extra) -> tuple:
+    drawing, constraints = isosceles(*extra)
+    system = System(drawing)
+    system.reducing = reducing
+    for constraint in constraints:
+        system.addConstraint(constraint)
+    system.recount()
+
+    a, b = drawing.lines[0].points
+    c = drawing.lines[1].p2
+    c.x, c.y = 15, -18
+    system.recount()
+    return a, b, c
+
+
+def solved(scenario, reducing: bool) -> np.ndarray:
+    drawing, constraints = scenario()
+    system = System(drawing)
+    system.reducing = reducing
+    for constraint in constraints:
+        system.addConstraint(constraint)
+    system.recount()
+    return np.array([point.coordinates for point in system.points])
+
+
+class ReductionTest(unittest.TestCase):
+
+    def testReducedMatchesFull(self):
+        for scenario in (triangle, linkage):
+            with self.subTest(scenario.__name__):
+                full = solved(scenario, False)
+                reduced = solved(scenario, True)
+                self.assertLessEqual(np.abs(full - reduced).max(), .1 + 1e-9)
+
+    def testMirroredApexMatchesFull(self):
+        full = [point.coordinates for point in flipped(False, Horizontal)]
+        reduced = [point.coordinates for point in flipped(True, Horizontal)]
+        self.assertEqual(reduced, full)
+        self.assertEqual(reduced[2], (15, -20))
+
+    def testRotatingBodyFollowsMirroredApex(self):
+        a, b, c = flipped(True)
+        self.assertLess(c.y, 0)
+        self.assertAlmostEqual(Line(a, b).length, 30, delta=.2)
+        self.assertAlmostEqual(Line(b, c).length, 25, delta=.2)
+        self.assertAlmostEqual(Line(c, a).length, 25, delta=.2)
+        self.assertLess(abs(b.y), 1)
+
+    def testTriangleIsOneBody(self):
+        drawing, constraints = triangle()
+        system = System(drawing)
+        for constraint in constraints:
+            system.addConstraint(constraint)
+        system.recount()
+
+        bodies = system.reduction.bodies()
+        self.assertEqual([len(body.points) for body, _ in bodies], [3])
+
+    def testAbsoluteConstraintKeepsClusters(self):
+        drawing, constraints = chain(4)
+        system = System(drawing)
+        for constraint in constraints:
+            system.addConstraint(constraint)
+        system.recount()
+
+        with mock.patch('cad.clusters.analyse', wraps=clusters.analyse) as analyse:
+            system.addConstraint(FixingY(drawing.lines[-1].p2, 10))
+            system.reduction.bodies()
+        self.assertEqual(analyse.call_count, 0)
+
+    def testShapingConstraintInvalidatesTouchedClusters(self):
+        drawing, constraints = chain(4)
+        system = System(drawing)
+        for constraint in constraints:
+            system.addConstraint(constraint)
+        system.recount()
+
+        length = constraints[3]
+        system.removeConstraint(length)
+        kept = [group for group, _ in system.reduction.clusters]
+        self.assertEqual(len(kept), 3)
+        self.assertTrue(all(group.isdisjoint(length.points) for group in kept))
+
+        system.addConstraint(length)
+        self.assertEqual(len(system.reduction.bodies()), 4)
+
+    def testRejectedGroupsStayCached(self):
+        drawing, constraints = chain(3)
+        system = System(drawing)
+        for constraint in constraints:
+            system.addConstraint(constraint)
+        system.recount()
+
+        self.assertIn(None, system.reduction.cache.values())
+        with mock.patch('cad.clusters.analyse', wraps=clusters.analyse) as analyse:
+            system.reduction.invalidate()
+            system.reduction.bodies()
+        self.assertEqual(analyse.call_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
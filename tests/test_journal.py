@@ -0,0 +1,134 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from cad import journal
+from cad.blocks import Block, Instance
+from cad.figures import Point, Line
+from cad.journal import Journal
+from cad.sketch import Sketch
+from cad.solver import FixingX, Horizontal, Length
+from tests import application
+
+
+def geometry(sketch) -> tuple:
+    lines = sorted(line.p1.coordinates + line.p2.coordinates for line in sketch.lines)
+    points = sorted(point.coordinates for point in sketch.points)
+    constraints = sorted(type(constraint).__name__ for constraint in sketch.system.constraints)
+    return lines, points, constraints
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        application()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'sketch')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def attach(self) -> tuple:
+        sketch = Sketch()
+        log = Journal(self.path)
+        log.attach(sketch)
+        return sketch, log
+
+    def draw(self, sketch):
+        a, b, c = Point(0, 0), Point(10, 3), Point(5, 20)
+        first, second = Line(a, b), Line(b, c)
+        sketch.addLine(first)
+        sketch.addLine(second)
+        sketch.addPoint(Point(7, 7))
+        sketch.system.addConstraint(Horizontal(first))
+        sketch.system.addConstraint(Length(second, 15.))
+        sketch.update()
+
+        for i in range(10):
+            sketch.addLine(Line(Point(i, 100), Point(i + 1, 101)))
+        sketch.removeLine(sketch.lines[-1])
+
+    def recovered(self) -> Sketch:
+        sketch, log = self.attach()
+        log.close()
+        return sketch
+
+    def testRecovery(self):
+        sketch, log = self.attach()
+        self.draw(sketch)
+        log.close()
+
+        self.assertEqual(geometry(self.recovered()), geometry(sketch))
+
+    def testTornTail(self):
+        sketch, log = self.attach()
+        self.draw(sketch)
+        log.close()
+
+        with open(self.path + '.journal', 'a') as fp:
+            fp.write('[999, ["line", 999, [1000, 0')
+
+        self.assertEqual(geometry(self.recovered()), geometry(sketch))
+
+    def testCompaction(self):
+        with mock.patch.object(journal, 'COMPACTION', 5):
+            sketch, log = self.attach()
+            self.draw(sketch)
+            sketch.addPoint(Point(40, 40))
+            log.close()
+
+        self.assertTrue(os.path.exists(self.path + '.snapshot'))
+        with open(self.path + '.journal') as fp:
+            self.assertLess(len(fp.readlines()), 5)
+        self.assertEqual(geometry(self.recovered()), geometry(sketch))
+
+    def testLineDragReusesIds(self):
+        sketch, log = self.attach()
+        sketch.addLine(Line(Point(0, 0), Point(1, 1)))
+        for i in range(200):
+            sketch.setLineEnd(sketch.lines[-1], Point(i, 2 * i))
+        log.close()
+
+        self.assertEqual(len(log.ids), 3)
+        model = journal.load(self.path)
+        self.assertEqual(len(model.points), 2)
+        self.assertEqual(geometry(self.recovered()), geometry(sketch))
+
+    def testRemovedLineLeavesNoPoints(self):
+        sketch, log = self.attach()
+        line = Line(Point(0, 0), Point(1, 1))
+        sketch.addLine(line)
+        sketch.system.addConstraint(Horizontal(line))
+        sketch.removeLine(line)
+        log.close()
+
+        self.assertEqual(log.ids, {})
+        model = journal.load(self.path)
+        self.assertEqual((model.points, model.lines, model.constraints), ({}, {}, {}))
+
+    def testInstanceOriginConstraintIsSkipped(self):
+        sketch, log = self.attach()
+        self.draw(sketch)
+        instance = Instance(Block([Line(Point(0, 0), Point(20, 3))]), Point(30, 30))
+        sketch.addInstance(instance)
+        sketch.system.addConstraint(FixingX(instance.origin, 40.))
+        sketch.system.addConstraint(FixingX(sketch.lines[0].p1, 2.))
+        log.close()
+
+        self.assertNotIn(instance.origin, log.ids)
+        names = geometry(self.recovered())[2]
+        self.assertEqual(names, ['FixingX', 'Horizontal', 'Length'])
+
+    def testUnknownReferencesAreSkipped(self):
+        with open(self.path + '.journal', 'w') as fp:
+            fp.write('[1, ["line", 1, [2, 0, 0], [3, 10, 0]]]\n')
+            fp.write('[2, ["constraint", 4, "FixingX", [99], [5]]]\n')
+            fp.write('[3, ["constraint", 5, "Horizontal", [1], []]]\n')
+
+        sketch = self.recovered()
+        self.assertEqual(geometry(sketch)[2], ['Horizontal'])
+
+
+if __name__ == '__main__':
+    unittest.main()
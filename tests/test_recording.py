@@ -0,0 +1,40 @@
+import unittest
+
+from cad import recording
+from cad.figures import Point, Line
+from cad.recording import Recorder
+from cad.sketch import Sketch
+from tests import application
+
+
+def sketch() -> Sketch:
+    result = Sketch()
+    result.addLines([Line(Point(0, 0), Point(10, 2)), Line(Point(20, 20), Point(30, 5))])
+    result.selection = result.lines[:1]
+    return result
+
+
+class RecordingTest(unittest.TestCase):
+
+    def setUp(self):
+        application()
+
+    def testActionsReplay(self):
+        recorded = sketch()
+        recorder = Recorder()
+        recorder.attach(recorded)
+        for action in ('copySelection', 'pasteFigures', 'removeSelection'):
+            recorded.perform(action)
+
+        actions = [entry['name'] for entry in recorder.events if entry['type'] == 'action']
+        self.assertEqual(actions, ['copySelection', 'pasteFigures', 'removeSelection'])
+
+        replayed = sketch()
+        for entry in recorder.events:
+            recording.dispatch(replayed, entry)
+        self.assertEqual(len(replayed.lines), 2)
+        self.assertEqual(recording.difference(recording.geometry(recorded), recording.geometry(replayed)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
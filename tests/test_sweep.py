@@ -0,0 +1,39 @@
+import unittest
+
+import numpy as np
+
+from cad.figures import Point, Line
+from cad.sketch import Sketch
+from cad.solver import Angle, FixingX, FixingY, Length
+from cad.sweep import sweep
+from tests import application
+
+
+class SweepTest(unittest.TestCase):
+
+    def setUp(self):
+        application()
+        self.sketch = Sketch()
+        line = Line(Point(0, 0), Point(10, 0))
+        self.sketch.addLine(line)
+        for constraint in (FixingX(line.p1, 0), FixingY(line.p1, 0), Length(line, 10)):
+            self.sketch.system.addConstraint(constraint)
+        self.angle = Angle(line, 0.)
+        self.sketch.system.addConstraint(self.angle)
+        self.sketch.update()
+
+    def testWorkerCountDoesNotChangeResults(self):
+        values = np.arange(0., 181., 15.)
+        serial = sweep(self.sketch, [self.angle], values, processes=1)
+        parallel = sweep(self.sketch, [self.angle], values, processes=4)
+
+        self.assertFalse(np.isnan(serial).any())
+        np.testing.assert_allclose(serial, parallel, atol=1e-3)
+
+    def testEmptySweep(self):
+        result = sweep(self.sketch, [self.angle], [])
+        self.assertEqual(result.shape, (0, 2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
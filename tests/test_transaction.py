@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+
+from cad import journal
+from cad.blocks import Block, Instance
+from cad.figures import Point, Line
+from cad.journal import Journal
+from cad.sketch import Sketch
+from cad.solver import FixingX, Horizontal, Length
+from tests import application
+
+
+class Rollback(Exception):
+    pass
+
+
+def geometry(sketch) -> tuple:
+    lines = [line.p1.coordinates + line.p2.coordinates for line in sketch.lines]
+    points = [point.coordinates for point in sketch.points]
+    constraints = [(type(c).__name__, c.parameter and getattr(c, c.parameter)) for c in sketch.system.constraints]
+    return lines, points, constraints
+
+
+class TransactionTest(unittest.TestCase):
+
+    def setUp(self):
+        application()
+        self.sketch = Sketch()
+        a, b, c = Point(0, 0), Point(10, 2), Point(20, 20)
+        self.first, self.second = Line(a, b), Line(b, c)
+        self.sketch.addLines([self.first, self.second])
+        self.sketch.addPoint(Point(4, 4))
+        self.length = Length(self.second, 15.)
+        self.sketch.system.addConstraint(Horizontal(self.first))
+        self.sketch.system.addConstraint(self.length)
+        self.sketch.update()
+
+    def rollback(self, edit):
+        with self.assertRaises(Rollback):
+            with self.sketch.transaction():
+                edit(self.sketch)
+                raise Rollback()
+
+    def testRollbackRestoresFiguresAndConstraints(self):
+        before = geometry(self.sketch)
+        references = {key: set(value) for key, value in self.sketch.system.references.items()}
+
+        def edit(sketch):
+            sketch.addLine(Line(Point(1, 1), Point(5, 5)))
+            sketch.addPoint(Point(3, 3))
+            sketch.removeFigures([self.second])
+            sketch.setLineEnd(self.first, Point(50, 50))
+            sketch.moveFigures(sketch.points, 3, 3)
+            sketch.system.addConstraint(FixingX(self.first.p1, 8.))
+
+        self.rollback(edit)
+
+        self.assertEqual(geometry(self.sketch), before)
+        self.assertEqual(self.sketch.system.references, references)
+        self.assertTrue(self.sketch.system.isUsed(self.second.p2))
+
+    def testRollbackRestoresParameters(self):
+        def edit(sketch):
+            self.length.length = 99.
+
+        self.rollback(edit)
+        self.assertEqual(self.length.length, 15.)
+
+    def testRollbackRestoresInstancesAndBlocks(self):
+        block = Block([Line(Point(0, 0), Point(20, 3))])
+        instance = Instance(block, Point(30, 30), angle=15.)
+        self.sketch.addInstance(instance)
+        origin = instance.origin
+
+        def edit(sketch):
+            instance.angle = 90.
+            sketch.moveFigures([instance], 5, 5)
+            block.lines.append(Line(Point(1, 1), Point(2, 2)))
+            block.addConstraint(Horizontal(block.lines[0]))
+            sketch.removeFigures([instance])
+
+        self.rollback(edit)
+
+        self.assertEqual(self.sketch.instances, [instance])
+        self.assertIs(instance.origin, origin)
+        self.assertEqual(origin.coordinates, (30, 30))
+        self.assertEqual(instance.angle, 15.)
+        self.assertEqual(len(block.lines), 1)
+        self.assertEqual(block.system.constraints, {})
+
+    def testNestedRollbackKeepsOuterEdits(self):
+        line = Line(Point(1, 1), Point(5, 5))
+
+        with self.sketch.transaction():
+            self.sketch.addLine(line)
+            with self.assertRaises(Rollback):
+                with self.sketch.transaction():
+                    self.sketch.removeLine(self.first)
+                    raise Rollback()
+
+        self.assertEqual(self.sketch.lines, [self.first, self.second, line])
+
+    def testJournalDropsRolledBackEdits(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sketch')
+            log = Journal(path)
+            log.attach(self.sketch)
+            ids = dict(log.ids)
+
+            def edit(sketch):
+                self.length.length = 99.
+                sketch.removeFigures([self.second])
+                sketch.addLine(Line(Point(1, 1), Point(5, 5)))
+
+            self.rollback(edit)
+            log.close()
+
+            self.assertEqual(log.ids, ids)
+            model = journal.load(path)
+            self.assertEqual(len(model.lines), 2)
+            self.assertEqual(sorted(args for _, _, args in model.constraints.values()), [[], [15.]])
+
+
+if __name__ == '__main__':
+    unittest.main()